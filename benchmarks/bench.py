@@ -0,0 +1,374 @@
+"""Panoramisk benchmarks.
+
+Numbers are the best of ``--repeat`` runs. Memory is measured with
+tracemalloc during an extra run:
+
+- ``peak_kib``: the peak of the memory allocated by the run. Temporary
+  objects freed between operations only count once, so this is not an
+  allocation rate
+- ``retained_bytes_per_op``: the memory allocated by the run and still
+  alive at its end, divided by the number of operations
+
+From a checkout where panoramisk is installed (``pip install -e .``), run
+all benchmarks and save the results::
+
+    $ python benchmarks/bench.py -o before.json
+
+Compare with a previous run::
+
+    $ python benchmarks/bench.py --compare before.json
+
+Use ``-k`` to only run benchmarks whose name contains a string.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from panoramisk import actions
+from panoramisk import fastagi_extension
+from panoramisk import message
+from panoramisk import testing
+from panoramisk import utils
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def frame(*lines):
+    return utils.EOL.join(lines)
+
+
+def newchannel(i):
+    return frame(
+        'Event: Newchannel',
+        'Privilege: call,all',
+        'Channel: SIP/gawel-%08x' % i,
+        'ChannelState: 0',
+        'ChannelStateDesc: Down',
+        'CallerIDNum: 201',
+        'CallerIDName: user 201',
+        'ConnectedLineNum: <unknown>',
+        'ConnectedLineName: <unknown>',
+        'Language: en',
+        'AccountCode: default',
+        'Context: default',
+        'Exten: 9011',
+        'Priority: 1',
+        'Uniqueid: 1437920906.%d' % i,
+        'Linkedid: 1437920906.%d' % i,
+    )
+
+
+def new_manager():
+    manager = testing.Manager(loop=asyncio.new_event_loop())
+    utils.EOL = '\r\n'
+    return manager
+
+
+def events_stream(count):
+    eol = utils.EOL
+    return ''.join(newchannel(i) + eol + eol
+                   for i in range(count)).encode('ascii')
+
+
+@benchmark
+def message_from_line():
+    line = newchannel(1)
+
+    def run():
+        for i in range(1000):
+            message.Message.from_line(line)
+    return 1000, run
+
+
+@benchmark
+def lazy_message_from_line():
+    line = newchannel(1)
+
+    def run():
+        for i in range(1000):
+            message.LazyMessage.from_line(line)
+    return 1000, run
+
+
+def data_received(chunk_size, handled):
+    manager = new_manager()
+    if handled:
+        manager.register_event('Newchannel', lambda manager, event: None)
+    protocol = manager.protocol
+    data = events_stream(1000)
+    if chunk_size:
+        chunks = [data[i:i + chunk_size]
+                  for i in range(0, len(data), chunk_size)]
+    else:
+        chunks = [data]
+
+    def run():
+        for chunk in chunks:
+            protocol.data_received(chunk)
+    return 1000, run
+
+
+@benchmark
+def data_received_fragmented():
+    return data_received(64, handled=True)
+
+
+@benchmark
+def data_received_coalesced():
+    return data_received(None, handled=True)
+
+
+@benchmark
+def data_received_unhandled():
+    return data_received(1400, handled=False)
+
+
+def dispatch(count):
+    manager = new_manager()
+    for i in range(count):
+        manager.register_event('Event%d' % i, lambda manager, event: None)
+        manager.register_event('Prefix%d*' % i, lambda manager, event: None)
+    manager.register_event('New*', lambda manager, event: None)
+    events = [message.Message({'Event': name})
+              for name in ('Newchannel', 'Event1', 'Prefix10', 'VarSet')]
+
+    def run():
+        for i in range(250):
+            for event in events:
+                manager.dispatch(event)
+    return 1000, run
+
+
+@benchmark
+def dispatch_10_patterns():
+    return dispatch(5)
+
+
+@benchmark
+def dispatch_200_patterns():
+    return dispatch(100)
+
+
+@benchmark
+def action_add_message():
+    lines = [frame('Event: PeerEntry', 'ActionID: 42',
+                   'ObjectName: %d' % i) for i in range(5000)]
+    messages = [message.Message.from_line(frame(
+        'Response: Success', 'ActionID: 42',
+        'EventList: start', 'Message: Peer status list will follow'))]
+    messages.extend(message.Message.from_line(line) for line in lines)
+    messages.append(message.Message.from_line(frame(
+        'Event: PeerlistComplete', 'ActionID: 42', 'EventList: Complete')))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    def run():
+        action = actions.Action({'Action': 'SIPpeers', 'ActionID': '42'})
+        for msg in messages:
+            action.add_message(msg)
+        assert action.done()
+    return len(messages), run
+
+
+class NullTransport:
+
+    def write(self, data):
+        pass
+
+    def writelines(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+def send_action(wait, coalesce=False):
+    manager = new_manager()
+    protocol = manager.protocol
+    protocol.transport = NullTransport()
+    protocol.coalesce_writes = coalesce
+
+    def run():
+        for i in range(1000):
+            manager.send_action({'Action': 'UserEvent', 'UserEvent': 'Bench'},
+                                wait=wait)
+        protocol.flush()
+        protocol.responses.clear()
+    return 1000, run
+
+
+@benchmark
+def send_action_tracked():
+    return send_action(wait=True)
+
+
+@benchmark
+def send_action_nowait():
+    return send_action(wait=False)
+
+
+@benchmark
+def send_action_coalesced():
+    return send_action(wait=False, coalesce=True)
+
+
+@benchmark
+def action_ids():
+    generator = utils.IdGenerator('action')
+
+    def run():
+        for i in range(1000):
+            generator()
+    return 1000, run
+
+
+ORIGINATE = {'Action': 'Originate', 'Channel': 'SIP/gawel',
+             'Context': 'default', 'Exten': '4242', 'Priority': '1',
+             'CallerID': 'gawel <201>', 'Timeout': '30000', 'Async': 'true',
+             'Variable': ['FROM_DID=4242', 'CAMPAIGN=42']}
+
+
+@benchmark
+def action_serialize():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    originates = [actions.Action(ORIGINATE) for i in range(1000)]
+
+    def run():
+        for action in originates:
+            action.payload = None
+            action.serialize()
+    return 1000, run
+
+
+@benchmark
+def action_template():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    template = actions.ActionTemplate(
+        dict((k, v) for k, v in ORIGINATE.items() if k != 'Channel'))
+
+    def run():
+        for i in range(1000):
+            template.render(Channel='SIP/gawel', ActionID='action/1/1/1')
+    return 1000, run
+
+
+@benchmark
+def fast_agi_requests():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    port = []
+
+    async def start():
+        app = fastagi_extension.FastAgi(loop=loop)
+
+        @app.route('bench')
+        async def route(request: fastagi_extension.Request, x: int = 0):
+            await request.send_command('ANSWER')
+            await request.send_command('SET VARIABLE x "%d"' % x)
+            await request.send_command('HANGUP')
+
+        server = await asyncio.start_server(app.handler, '127.0.0.1', 0)
+        port.append(server.sockets[0].getsockname()[1])
+        return server
+
+    def reply(client, msg):
+        client.writer.write(b'200 result=0\n')
+
+    async def call():
+        client = testing.FakeAsteriskClient(port[0])
+        client.handler(reply)
+        await client.connect()
+        await client.write(testing.generate_agi_payload(
+            'bench', kwargs={'x': 1}))
+        for i in range(3):
+            await client.read()
+        await client.close()
+
+    loop.run_until_complete(start())
+
+    def run():
+        loop.run_until_complete(asyncio.gather(*[call() for i in range(50)]))
+    return 50, run
+
+
+def measure(func, repeat):
+    ops, run = func()
+    run()  # warmup
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    # only the memory allocated by the run is traced
+    tracemalloc.start()
+    run()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(timings)
+    return {
+        'ops': ops,
+        'us_per_op': best / ops * 1e6,
+        'median_us_per_op': statistics.median(timings) / ops * 1e6,
+        'ops_per_second': ops / best,
+        'peak_kib': peak / 1024,
+        'retained_bytes_per_op': retained / ops,
+    }
+
+
+def compare(results, baseline):
+    print('%-28s %12s %12s %8s' % ('benchmark', 'before', 'after', 'change'))
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result['us_per_op'] / before['us_per_op'] - 1
+        print('%-28s %10.2fus %10.2fus %+7.1f%%' % (
+            name, before['us_per_op'], result['us_per_op'], change * 100))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-k', dest='keyword', default='',
+                        help='Only run benchmarks matching this string')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'),
+                        help='Save results as json')
+    parser.add_argument('--compare', type=argparse.FileType('r'),
+                        help='Compare with the results of a previous run')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for func in BENCHMARKS:
+        if args.keyword not in func.__name__:
+            continue
+        result = results[func.__name__] = measure(func, args.repeat)
+        print('%-28s %10.2fus/op %12.0f ops/s %8.0f KiB peak '
+              '%8.0f B/op retained' % (
+                  func.__name__, result['us_per_op'],
+                  result['ops_per_second'], result['peak_kib'],
+                  result['retained_bytes_per_op']))
+
+    if args.output:
+        json.dump({
+            'python': sys.version,
+            'platform': platform.platform(),
+            'results': results,
+        }, args.output, indent=2, sort_keys=True)
+    if args.compare:
+        compare(results, json.load(args.compare)['results'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 from .manager import Manager  # NOQA
 from .message import Message  # NOQA
 from .call_manager import CallManager  # NOQA
+from .pool import ManagerPool  # NOQA
+from .cluster import ManagerCluster  # NOQA
 from . import fast_agi  # NOQA
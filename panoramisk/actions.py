@@ -1,9 +1,105 @@
 import asyncio
+from collections import deque
 
 from . import utils
 
 
-class Action(utils.CaseInsensitiveDict, asyncio.Future):
+def serialize(headers, encoding='utf8'):
+    """Serialize a dict of headers to bytes, in insertion order, without
+    creating an :class:`Action`:
+
+    .. code-block:: python
+
+        >>> payload = serialize({'Action': 'UserEvent', 'UserEvent': 'Ping'})
+        >>> print(payload.decode()) # doctest: +NORMALIZE_WHITESPACE
+        Action: UserEvent
+        UserEvent: Ping
+    """
+    eol = utils.EOL
+    lines = []
+    append = lines.append
+    for k, v in headers.items():
+        if v.__class__ is str:
+            append(k + ': ' + v + eol)
+        elif isinstance(v, (list, tuple)):
+            lines.extend(['%s: %s%s' % (k, i, eol) for i in v])
+        else:
+            append('%s: %s%s' % (k, v, eol))
+    append(eol)
+    return ''.join(lines).encode(encoding)
+
+
+class ActionTemplate:
+    """Precompiled action. The static headers are serialized once, only the
+    ActionID and the ``fields`` given to :meth:`action` or :meth:`render`
+    are serialized for each action:
+
+    .. code-block:: python
+
+        >>> originate = ActionTemplate({
+        ...     'Action': 'Originate', 'Context': 'default',
+        ...     'Priority': '1', 'Async': 'true'})
+        >>> action = originate.action(Channel='SIP/gawel', Exten='4242')
+        >>> action['exten']
+        '4242'
+
+    A field can override a header of the template. The header is then left
+    out of the static part so it's only written once, with the new value.
+
+    Then send it with :meth:`~panoramisk.Manager.send_action`. Don't modify
+    the headers of such actions.
+    """
+
+    def __init__(self, headers, encoding='utf8', action_class=None):
+        self.headers = headers
+        self.keys = frozenset(k.lower() for k in headers)
+        self.encoding = encoding
+        self.action_class = action_class or Action
+        self.eol = None
+        self.prefixes = {}
+
+    def compile(self, overridden=frozenset()):
+        """Return the static headers serialized to bytes, without the
+        ``overridden`` ones (a set of lower case names)"""
+        eol = utils.EOL
+        if self.eol != eol:
+            self.prefixes = {}
+            self.eol = eol
+        prefix = self.prefixes.get(overridden)
+        if prefix is None:
+            headers = self.headers
+            if overridden:
+                headers = dict((k, v) for k, v in headers.items()
+                               if k.lower() not in overridden)
+            # serialize without the final EOL
+            prefix = serialize(headers, self.encoding)[:-len(eol)]
+            self.prefixes[overridden] = prefix
+        return prefix
+
+    def overridden(self, fields):
+        return self.keys.intersection([k.lower() for k in fields])
+
+    def render(self, **fields):
+        """Return the action serialized to bytes"""
+        if not fields:
+            return self.compile() + self.eol.encode(self.encoding)
+        prefix = self.compile(self.overridden(fields))
+        return prefix + serialize(fields, self.encoding)
+
+    def action(self, as_list=None, **fields):
+        """Return an :class:`Action` with its payload already serialized"""
+        action = self.action_class(self.headers, as_list=as_list, **fields)
+        overridden = self.overridden(fields)
+        static = self.keys - overridden
+        # the action may have added its own headers (ActionID, CommandID)
+        headers = dict((k, action[k]) for k in action
+                       if k.lower() not in static)
+        action.payload = (self.compile(overridden) +
+                          serialize(headers, self.encoding))
+        return action
+
+
+class Action(utils.BaseCaseInsensitiveDict, asyncio.Future):
     """Dict like object to handle actions.
     Generate action IDs for you:
 
@@ -21,35 +117,116 @@ class Action(utils.CaseInsensitiveDict, asyncio.Future):
         ...                  'Variable': ['1', '2']})
         >>> print(action) # doctest: +NORMALIZE_WHITESPACE
         Action: SIPnotify
-        ActionID: action/myuuid/1/2
         Variable: 1
         Variable: 2
+        ActionID: action/myuuid/1/2
+
+    Events ending with ``Complete`` or listed in ``terminal_events`` are the
+    last response of a list. ``terminal_events_by_action`` maps lower case
+    action names to their own terminal events.
+
+    ``response_timeout`` is the max number of seconds to wait for all the
+    responses. The action then fails with
+    :class:`~panoramisk.exceptions.ActionTimeoutError`. Default to the
+    ``action_timeout`` option of the :class:`~panoramisk.Manager`.
+
+    Big lists can be streamed instead of being kept in memory. With a
+    ``sink``, each response is passed to ``sink(message)`` (which can return
+    a coroutine). With a ``window``, responses are released once consumed by
+    ``async for``. Once the loop started, reading from the server is paused
+    when ``window`` responses are waiting and no other action waits for its
+    responses. This pauses the whole AMI session: events wait too. Sending
+    another action resumes reading so awaiting actions in the loop works.
+    In both cases the result is only the first response and the last one:
+
+    .. code-block:: python
+
+        action = Action({'Action': 'Status'}, window=100)
+        async for event in manager.send_action(action):
+            print(event)
+
+    Awaiting the action stops the window: reading is resumed and the
+    remaining responses are dropped. If you ``break`` out of the loop, await
+    the action directly or cancel it, else reading stays paused.
+    ``asyncio.wait_for()`` and ``asyncio.gather()`` don't stop the window
+    since they don't await the action itself.
     """
 
     action_id_generator = utils.IdGenerator('action')
 
+    terminal_events = frozenset(('AsyncAGIExec',))
+    terminal_events_by_action = {}
+    terminal_subevents = frozenset(('End', 'Exec'))
+    terminal_responses = frozenset(('Success', 'Error', 'Fail', 'Failure'))
+
     def __init__(self, *args, **kwargs):
         self.as_list = kwargs.pop('as_list', None)
-        super(Action, self).__init__(*args, **kwargs)
+        self.response_timeout = kwargs.pop('response_timeout', None)
+        self.window = kwargs.pop('window', None)
+        self.sink = kwargs.pop('sink', None)
+        self._values = {}
+        self._keys = None
+        self.payload = None
+        self.update(*args, **kwargs)
         asyncio.Future.__init__(self)
         if 'actionid' not in self:
             self['ActionID'] = self.action_id_generator()
         self.responses = []
         self.responses_index = 0
+        self.waiter = None
+        self._multi = None
+        self._terminal_events = None
+        self.received = 0
+        self.pending = None
+        if self.window and self.sink is None:
+            self.pending = deque()
+        self.transport = None
+        self.protocol = None
+        self.reading_paused = False
+        self.iterating = None
 
     def __aiter__(self):
+        if self.iterating is None:
+            self.iterating = True
+            self.pause_reading()
         return self
 
+    def __await__(self):
+        if self.pending is not None:
+            # nobody consumes the window anymore
+            self.iterating = False
+            self.pending.clear()
+            self.resume_reading()
+        return (yield from asyncio.Future.__await__(self))
+
     async def __anext__(self):
         while True:
-            if self.responses_index < len(self.responses):
+            if self.pending is not None:
+                if self.pending:
+                    res = self.pending.popleft()
+                    if (self.reading_paused and
+                            len(self.pending) <= self.window // 2):
+                        self.resume_reading()
+                    return res
+            elif self.responses_index < len(self.responses):
                 res = self.responses[self.responses_index]
                 self.responses_index += 1
                 return res
-            elif self.done():
+            if self.done():
                 raise StopAsyncIteration
             else:
-                await asyncio.sleep(.1)
+                if self.waiter is None:
+                    # also wake up iterators on cancel() / set_exception()
+                    self.add_done_callback(self.wakeup)
+                if self.waiter is None or self.waiter.done():
+                    self.waiter = self.get_loop().create_future()
+                await self.waiter
+
+    def wakeup(self, *args):
+        """Wake up async iterators waiting for a new response"""
+        waiter = self.waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
 
     @property
     def id(self):
@@ -57,23 +234,35 @@ class Action(utils.CaseInsensitiveDict, asyncio.Future):
 
     action_id = id
 
+    def __setitem__(self, key, value):
+        self.payload = None
+        super(Action, self).__setitem__(key, value)
+
+    def serialize(self, encoding='utf8'):
+        """Return the action serialized to bytes. The result is cached until
+        a header is modified"""
+        payload = self.payload
+        if payload is None:
+            payload = self.payload = serialize(self, encoding)
+        return payload
+
     def __str__(self):
-        action = []
-        for k, v in sorted(self.items()):
-            if isinstance(v, (list, tuple)):
-                action.extend(['%s: %s' % (k, i) for i in v])
-            else:
-                action.append('%s: %s' % (k, v))
-        action.append(utils.EOL)
-        return utils.EOL.join(action)
+        return serialize(self).decode('utf8')
 
     @property
     def multi(self):
-        resp = self.responses[0]
-        msg = resp.message.lower()
+        """True if the action expects a list of responses. Computed once from
+        the first response"""
+        multi = self._multi
+        if multi is None:
+            multi = self._multi = self.is_multi(self.responses[0])
+        return multi
+
+    def is_multi(self, resp):
         if self.as_list is not None:
             return bool(self.as_list)
-        elif resp.subevent == 'Start':
+        msg = resp.message.lower()
+        if resp.subevent == 'Start':
             return True
         elif 'EventList' in resp and resp['EventList'] == 'start':
             return True
@@ -90,20 +279,78 @@ class Action(utils.CaseInsensitiveDict, asyncio.Future):
     @property
     def completed(self):
         resp = self.responses[-1]
-        if resp.event.endswith('Complete'):
-            return True
-        elif resp.subevent in ('End', 'Exec'):
-            return True
-        elif resp.event in ('AsyncAGIExec',):
+        event = resp.event
+        if event:
+            terminal_events = self._terminal_events
+            if terminal_events is None:
+                terminal_events = self._terminal_events = (
+                    self.terminal_events |
+                    self.terminal_events_by_action.get(
+                        self['action'].lower(), frozenset()))
+            if event in terminal_events or event.endswith('Complete'):
+                return True
+        if resp.response in self.terminal_responses:
             return True
-        elif resp.response in ('Success', 'Error', 'Fail', 'Failure'):
+        elif resp.subevent in self.terminal_subevents:
             return True
         elif not self.multi:
             return True
         return False
 
+    @property
+    def streaming(self):
+        return bool(self.window or self.sink)
+
+    def stream(self, message):
+        """Pass a response to the sink or to the window"""
+        if self.sink is not None:
+            ret = self.sink(message)
+            if asyncio.iscoroutine(ret) or isinstance(ret, asyncio.Future):
+                asyncio.ensure_future(ret, loop=self.get_loop())
+        elif self.iterating is not False:
+            self.pending.append(message)
+            self.pause_reading()
+
+    def pause_reading(self):
+        """Pause reading from the server if an ``async for`` loop has
+        ``window`` responses waiting"""
+        if (self.iterating and not self.reading_paused and
+                self.pending is not None and
+                len(self.pending) >= self.window and
+                self.transport is not None and not self.done()):
+            protocol = self.protocol
+            if protocol is not None:
+                if protocol.outstanding > 1:
+                    # other actions wait for their responses
+                    return
+                protocol.reading_paused_by = self
+            self.reading_paused = True
+            self.transport.pause_reading()
+            self.add_done_callback(self.resume_reading)
+
+    def resume_reading(self, *args):
+        if self.reading_paused:
+            self.reading_paused = False
+            protocol = self.protocol
+            if (protocol is not None and
+                    protocol.reading_paused_by is self):
+                protocol.reading_paused_by = None
+            if not self.transport.is_closing():
+                self.transport.resume_reading()
+
     def add_message(self, message):
-        self.responses.append(message)
+        self.received += 1
+        if self.streaming:
+            # only keep the first and the last responses
+            if len(self.responses) > 1:
+                self.responses[-1] = message
+            else:
+                self.responses.append(message)
+            self.stream(message)
+        else:
+            self.responses.append(message)
+        if self.waiter is not None:
+            self.wakeup()
         multi = self.multi
         if self.completed and not self.done():
             if multi and len(self.responses) > 1:
@@ -124,11 +371,12 @@ class Command(Action):
 
     .. code-block:: python
 
-        >>> command = Command({'Command' : 'Do something'})
+        >>> command = Command({'Action': 'Command',
+        ...                    'Command': 'Do something'})
         >>> print(command) # doctest: +NORMALIZE_WHITESPACE
         Action: Command
-        ActionID: action/myuuid/1/1
         Command: Do something
+        ActionID: action/myuuid/1/1
         CommandID: command/myuuid/1/1
     """
 
@@ -1,25 +1,60 @@
 import logging
 import asyncio
-from collections import deque
 
 from .message import Message
 from . import actions
 from . import utils
+from .exceptions import ActionTimeoutError
 
 
 class AMIProtocol(asyncio.Protocol):
 
+    message_class = Message
+    prefilter = False
+    recorder = None
+    scheduler = None
+    action_timeout = None
+    timers = None
+    loop = None
+    coalesce_writes = False
+    coalesce_max_bytes = 65536
+    # the windowed action which paused reading, if any
+    reading_paused_by = None
+
     def connection_made(self, transport):
         self.transport = transport
         self.closed = False
-        self.queue = deque()
+        self.buffer = bytearray()
+        self.scan_offset = 0
         self.responses = {}
+        self.outstanding = 0
+        self.write_buffer = []
+        self.write_buffer_size = 0
+        self.flush_handle = None
         self.factory = None
         self.version = None
         self.log = logging.getLogger(__name__)
 
     def send(self, data, as_list=False):
-        encoding = getattr(self, 'encoding', 'ascii')
+        data = self.track(data, as_list=as_list)
+        if self.scheduler is not None:
+            self.scheduler.submit(data)
+        else:
+            self.write(data)
+        return data
+
+    def send_many(self, datas, as_list=False):
+        """Send several actions with a single write"""
+        datas = [self.track(data, as_list=as_list) for data in datas]
+        if self.scheduler is not None:
+            for data in datas:
+                self.scheduler.submit(data)
+        else:
+            self.writelines(datas)
+        return datas
+
+    def track(self, data, as_list=False):
+        """Return an Action registered to receive its responses"""
         if not isinstance(data, actions.Action):
             if 'Command' in data:
                 klass = actions.Command
@@ -27,50 +62,190 @@ class AMIProtocol(asyncio.Protocol):
                 klass = actions.Action
             data = klass(data, as_list=as_list)
         data.as_list = as_list
+        if data.id not in self.responses:
+            self.outstanding += 1
         self.responses[data.id] = data
         if data.action_id:
             self.responses[data.action_id] = data
+        timeout = data.response_timeout
+        if timeout is None:
+            timeout = self.action_timeout
+        if timeout is not None:
+            if self.timers is None:
+                self.timers = utils.TimerWheel(data.get_loop(),
+                                               self.action_timed_out)
+            self.timers.add(data, timeout)
+        paused_by = self.reading_paused_by
+        if paused_by is not None and paused_by is not data:
+            # a window must not block the responses of other actions
+            paused_by.resume_reading()
+        if data.window:
+            data.transport = self.transport
+            data.protocol = self
+        return data
+
+    def send_nowait(self, data):
+        """Send an action without tracking its responses"""
+        payload = actions.serialize(data, getattr(self, 'encoding', 'ascii'))
+        if self.scheduler is not None:
+            name = next((v for k, v in data.items() if k.lower() == 'action'),
+                        '')
+            self.scheduler.submit(payload, name=name)
+        else:
+            self.write(payload)
+
+    def write(self, action):
+        """Write an Action or a serialized action to the transport"""
+        encoding = getattr(self, 'encoding', 'ascii')
         try:
-            self.transport.write(str(data).encode(encoding))
+            if isinstance(action, bytes):
+                payload = action
+            else:
+                payload = action.serialize(encoding)
+            if self.coalesce_writes:
+                self.coalesce(payload)
+                return
+            if self.recorder is not None:
+                self.recorder.record('out', payload)
+            self.transport.write(payload)
         except Exception:  # pragma: no cover
-            self.log.exception('Fail to send %r' % data)
-        return data
+            self.log.exception('Fail to send %r' % action)
+
+    def writelines(self, actions):
+        """Write several Actions or serialized actions at once"""
+        encoding = getattr(self, 'encoding', 'ascii')
+        try:
+            payloads = [action if isinstance(action, bytes)
+                        else action.serialize(encoding)
+                        for action in actions]
+            if self.coalesce_writes:
+                for payload in payloads:
+                    self.coalesce(payload)
+                return
+            if self.recorder is not None:
+                self.recorder.record('out', b''.join(payloads))
+            self.transport.writelines(payloads)
+        except Exception:  # pragma: no cover
+            self.log.exception('Fail to send %r' % actions)
+
+    def coalesce(self, payload):
+        """Buffer a payload. Buffered payloads are written at the end of the
+        current loop iteration or when the buffer reaches
+        ``coalesce_max_bytes``"""
+        self.write_buffer.append(payload)
+        self.write_buffer_size += len(payload)
+        if self.write_buffer_size >= self.coalesce_max_bytes:
+            self.flush()
+        elif self.flush_handle is None:
+            loop = self.loop or asyncio.get_event_loop()
+            self.flush_handle = loop.call_soon(self.flush)
+
+    def flush(self):
+        """Write buffered payloads"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        payloads = self.write_buffer
+        if not payloads:
+            return
+        self.write_buffer = []
+        self.write_buffer_size = 0
+        if self.recorder is not None:
+            self.recorder.record('out', b''.join(payloads))
+        if len(payloads) == 1:
+            self.transport.write(payloads[0])
+        else:
+            self.transport.writelines(payloads)
+
+    def pause_writing(self):
+        if self.scheduler is not None:
+            self.scheduler.pause_writing()
+
+    def resume_writing(self):
+        if self.scheduler is not None:
+            self.scheduler.resume_writing()
 
     def data_received(self, data):
         encoding = getattr(self, 'encoding', 'ascii')
-        data = data.decode(encoding, 'ignore')
-        if getattr(self.factory, 'save_stream', None):  # pragma: no cover
-            stream = self.factory.save_stream
-            if hasattr(stream, 'write'):
-                stream.write(data.encode(encoding))
-            else:
-                with open(stream, 'a+') as fd:
-                    fd.write(data.encode(encoding))
+        if self.recorder is not None:
+            self.recorder.record('in', data)
         # Very verbose, uncomment only if necessary
         # self.log.debug('data received: "%s"', data)
 
         if self.version is None:
-            if data.startswith('Asterisk Call Manager/'):
-                version, __, __ = data.partition(utils.EOL)
-                __, __, version = version.partition('/')
-                self.version = version.strip()
+            if data.startswith(b'Asterisk Call Manager/'):
+                version, __, __ = data.partition(utils.EOL.encode(encoding))
+                __, __, version = version.partition(b'/')
+                self.version = version.decode(encoding, 'ignore').strip()
                 self.log.info("protocol version: '%s'", self.version)
 
-        if self.queue:
-            data = self.queue.popleft() + data
-        lines = data.split(utils.EOL+utils.EOL)
-        self.queue.append(lines.pop(-1))
-        for line in lines:
+        self.buffer += data
+        prefilter = self.prefilter and self.factory is not None
+        for frame in self.split_frames():
+            if prefilter and self.is_ignored(frame):
+                self.factory.skipped_frames += 1
+                continue
             # Because sometimes me receive only one EOL from Asterisk
-            line = line.strip()
+            line = frame.decode(encoding, 'ignore').strip()
             # Very verbose, uncomment only if necessary
             # self.log.debug('message received: "%s"', line)
-            message = Message.from_line(line)
+            message = self.message_class.from_line(line)
             self.log.debug('message interpreted: %r', message)
             if message is None:
                 continue
             self.handle_message(message)
 
+    def split_frames(self):
+        """Pop all complete frames from the receive buffer.
+
+        Only the bytes received since the last call are scanned for the frame
+        separator so a frame split across many chunks is not scanned again
+        and again.
+        """
+        buffer = self.buffer
+        separator = (utils.EOL + utils.EOL).encode('ascii')
+        frames = []
+        start = 0
+        index = buffer.find(separator, self.scan_offset)
+        while index != -1:
+            frames.append(buffer[start:index])
+            start = index + len(separator)
+            index = buffer.find(separator, start)
+        if start:
+            del buffer[:start]
+        # the separator may be split between this chunk and the next one
+        self.scan_offset = max(0, len(buffer) - len(separator) + 1)
+        return frames
+
+    def is_ignored(self, frame):
+        """Return True if a raw frame is an event nobody is waiting for. This
+        only looks at the Event, ActionID and CommandID headers so we don't
+        have to parse the whole frame"""
+        if not frame.startswith(b'Event: '):
+            return False
+        encoding = getattr(self, 'encoding', 'ascii')
+        eol = utils.EOL.encode('ascii')
+        end = frame.find(eol)
+        if end == -1:
+            end = len(frame)
+        name = frame[7:end].decode(encoding, 'ignore').strip()
+        if name.lower() == 'shutdown':
+            return False
+        if self.responses:
+            # header names may have any case (ActionId, CommandId)
+            lowered = frame.lower()
+            for header in (b'actionid: ', b'commandid: '):
+                start = lowered.find(eol + header)
+                if start != -1:
+                    start += len(eol) + len(header)
+                    end = frame.find(eol, start)
+                    if end == -1:
+                        end = len(frame)
+                    value = frame[start:end].decode(encoding, 'ignore')
+                    if value in self.responses:
+                        return False
+        return not self.factory.has_callbacks(name)
+
     def handle_message(self, message):
         response = self.responses.get(message.id)
         if response is None and message.action_id:
@@ -78,20 +253,46 @@ class AMIProtocol(asyncio.Protocol):
         if response is not None:
             if response.add_message(message):
                 # completed; dequeue
-                self.responses.pop(response.id)
-                if response.action_id:
-                    self.responses.pop(response.action_id, None)
+                self.forget(response)
         elif 'event' in message:
             if message['event'].lower() == 'shutdown':
                 self.connection_lost(message)
             self.factory.dispatch(message)
 
+    def forget(self, action):
+        """Stop waiting for the responses of an action"""
+        if self.responses.pop(action.id, None) is not None:
+            self.outstanding -= 1
+        if action.action_id:
+            self.responses.pop(action.action_id, None)
+        if self.timers is not None:
+            self.timers.discard(action)
+
+    def action_timed_out(self, action):
+        self.forget(action)
+        if self.factory is not None:
+            self.factory.timed_out_actions += 1
+        if not action.done():
+            timeout = action.response_timeout or self.action_timeout
+            action.set_exception(ActionTimeoutError(
+                'No response to %s after %ss' % (action.id, timeout), action))
+
     def connection_lost(self, exc):
         if not self.closed:
             self.close()
             self.factory.connection_lost(exc)
 
     def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+        if self.timers is not None:
+            self.timers.close()
+        if (self.write_buffer and not self.closed and
+                not self.transport.is_closing()):
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover
+                self.log.exception('Fail to flush pending writes')
         if self.factory and self.responses:
             uuids = set()
             forgetable_actions = self.factory.forgetable_actions
@@ -103,12 +304,13 @@ class AMIProtocol(asyncio.Protocol):
                     continue
                 elif action.done():  # pragma: no cover
                     continue
-                elif action.responses:
+                elif action.received:
                     # If at least one response was receive from asterisk we don't queue it again
                     continue
                 else:
                     self.log.info('Adding action "%s" to awaiting list: %s', action['action'].lower(), str(action))
                     awaiting_actions.append(action)
+            self.outstanding = 0
         if not self.closed:
             try:
                 self.transport.close()
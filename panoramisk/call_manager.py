@@ -1,30 +1,99 @@
 import asyncio
+import time
+from collections import OrderedDict
 from . import manager
 from . import actions
+from .message import LazyMessage
 from datetime import datetime
 from functools import partial
 
 
 class Call:
 
-    def __init__(self, uniqueid):
+    overflow_policies = ('drop_oldest', 'drop_newest')
+
+    def __init__(self, uniqueid, maxsize=0, overflow='drop_oldest'):
         self.uniqueid = uniqueid
         self.action_id = None
-        self.queue = asyncio.Queue()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflow = overflow
+        self.dropped = 0
         self.created_at = datetime.now()
+        self.last_event_at = time.monotonic()
 
     def append(self, *events):
+        """Queue events. Return the number of events dropped because the queue
+        is full"""
+        dropped = 0
         for e in events:
-            self.queue.put_nowait(e)
+            try:
+                self.queue.put_nowait(e)
+            except asyncio.QueueFull:
+                dropped += 1
+                if self.overflow == 'drop_oldest':
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(e)
+        self.dropped += dropped
+        self.last_event_at = time.monotonic()
+        return dropped
+
+
+class CallMessage(LazyMessage):
+    """A :class:`~panoramisk.message.LazyMessage` which also extracts the
+    headers used to find the call of an event"""
+
+    __slots__ = ()
+
+    eager_keys = LazyMessage.eager_keys + ('Uniqueid', 'Uniqueid1', 'Linkedid')
 
 
 class CallManager(manager.Manager):
+    """A Manager which queue events per call.
+
+    Options:
+
+    - ``call_queue_size``: max events queued per call. 0 means unbounded
+    - ``call_queue_overflow``: ``drop_oldest`` or ``drop_newest``. What to do
+      when a call queue is full
+    - ``call_ttl``: forget calls without events since ``call_ttl`` seconds
+    - ``max_calls``: max calls tracked. The least active calls are forgotten
+      first
+    - ``originated_calls_only``: only track calls returned by
+      :meth:`send_originate` and the channels linked to them. Events of a
+      call are queued once its ``OriginateResponse`` is received, or as soon
+      as the action is sent if it contains a ``ChannelId``
+
+    ``dropped_events``, ``expired_calls`` and ``evicted_calls`` count what
+    was discarded.
+    """
+
+    defaults = dict(manager.Manager.defaults, message_class=CallMessage)
 
     def __init__(self, **config):
         super(CallManager, self).__init__(**config)
+        self.originated_calls_only = bool(
+            config.get('originated_calls_only', False))
         self.CallClass = config.get('CallClass', Call)
-        self.calls_queues = {}
+        self.call_queue_size = int(config.get('call_queue_size', 0))
+        self.call_queue_overflow = config.get('call_queue_overflow',
+                                              'drop_oldest')
+        if self.call_queue_overflow not in Call.overflow_policies:
+            raise ValueError(
+                'Invalid call_queue_overflow: %r' % self.call_queue_overflow)
+        self.call_ttl = config.get('call_ttl')
+        if self.call_ttl is not None:
+            self.call_ttl = float(self.call_ttl)
+        self.max_calls = config.get('max_calls')
+        if self.max_calls is not None:
+            self.max_calls = int(self.max_calls)
+        self.calls_queues = OrderedDict()
+        # last activity of each call in calls_queues
+        self.calls_activity = {}
         self.calls = {}
+        self.dropped_events = 0
+        self.expired_calls = 0
+        self.evicted_calls = 0
+        self.expire_handle = None
         self.register_event('*', self.handle_calls)
 
     def set_result(self, future, result):
@@ -36,8 +105,10 @@ class CallManager(manager.Manager):
         uniqueid = event.uniqueid.split('.', 1)[0]
         if uniqueid in self.calls_queues:
             call = self.calls_queues[uniqueid]
+        elif self.originated_calls_only:
+            call = self.track_call(uniqueid)
         else:
-            call = Call(uniqueid)
+            call = self.create_call(uniqueid)
         call.action_id = event.action_id
         if not future.done():
             future.set_result(call)
@@ -45,6 +116,10 @@ class CallManager(manager.Manager):
     def send_originate(self, action):
         action['Async'] = 'true'
         action = actions.Action(action)
+        if self.originated_calls_only and 'channelid' in action:
+            uniqueid = action['channelid'].split('.', 1)[0]
+            if uniqueid not in self.calls_queues:
+                self.track_call(uniqueid)
         future = self.loop.create_future()
         self.send_action(action).add_done_callback(
             partial(self.set_result, future))
@@ -52,10 +127,83 @@ class CallManager(manager.Manager):
 
     def clean_originate(self, call):
         self.calls_queues.pop(call.uniqueid, None)
+        self.calls_activity.pop(call.uniqueid, None)
+
+    def create_call(self, uniqueid):
+        kwargs = {}
+        # only pass the options which are set so CallClass with the old
+        # signature still works
+        if self.call_queue_size:
+            kwargs['maxsize'] = self.call_queue_size
+        if self.call_queue_overflow != 'drop_oldest':
+            kwargs['overflow'] = self.call_queue_overflow
+        return self.CallClass(uniqueid, **kwargs)
+
+    def track_call(self, uniqueid):
+        """Create a Call and start to queue its events"""
+        call = self.calls_queues[uniqueid] = self.create_call(uniqueid)
+        self.calls_activity[uniqueid] = time.monotonic()
+        if self.max_calls is not None:
+            while len(self.calls_queues) > self.max_calls:
+                evicted, _ = self.calls_queues.popitem(last=False)
+                self.calls_activity.pop(evicted, None)
+                self.evicted_calls += 1
+        if self.call_ttl is not None and self.expire_handle is None:
+            self.expire_handle = self.loop.call_later(self.call_ttl,
+                                                      self.expire_calls)
+        return call
+
+    def touch_call(self, uniqueid):
+        """Mark a tracked call as active"""
+        self.calls_queues.move_to_end(uniqueid)
+        self.calls_activity[uniqueid] = time.monotonic()
+
+    def expire_calls(self):
+        """Forget calls which did not receive events since ``call_ttl``"""
+        self.expire_handle = None
+        now = time.monotonic()
+        # calls are ordered by last activity
+        while self.calls_queues:
+            uniqueid = next(iter(self.calls_queues))
+            delay = self.calls_activity.get(uniqueid, 0) + self.call_ttl - now
+            if delay > 0:
+                self.expire_handle = self.loop.call_later(delay,
+                                                          self.expire_calls)
+                break
+            del self.calls_queues[uniqueid]
+            self.calls_activity.pop(uniqueid, None)
+            self.expired_calls += 1
 
     def handle_calls(self, manager, event):
         uniqueid = event.uniqueid or event.uniqueid1
         if uniqueid:
             uniqueid = uniqueid.split('.', 1)[0]
-            call = self.calls_queues.setdefault(uniqueid, Call(uniqueid))
-            call.append(event)
+            call = self.calls_queues.get(uniqueid)
+            if call is None:
+                if self.originated_calls_only:
+                    call = self.linked_call(event, uniqueid)
+                    if call is None:
+                        return
+                else:
+                    call = self.track_call(uniqueid)
+            else:
+                self.touch_call(uniqueid)
+            self.dropped_events += call.append(event) or 0
+
+    def linked_call(self, event, uniqueid):
+        """Return the tracked call linked to an event, if any"""
+        linkedid = event.linkedid
+        if linkedid:
+            linkedid = linkedid.split('.', 1)[0]
+            if linkedid != uniqueid:
+                call = self.calls_queues.get(linkedid)
+                if call is not None:
+                    self.touch_call(linkedid)
+                return call
+        return None
+
+    def close(self):
+        if self.expire_handle is not None:
+            self.expire_handle.cancel()
+            self.expire_handle = None
+        super(CallManager, self).close()
@@ -0,0 +1,252 @@
+import gzip
+import io
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class StreamRecorder:
+    """Record AMI traffic to a capture file.
+
+    Chunks are queued by the event loop and written by a background thread
+    through a buffered file. Each record contains the direction (``in`` or
+    ``out``), a timestamp and the raw bytes::
+
+        PANORAMISK-CAPTURE 1
+        in 1437920906.123456 35
+        Event: PeerStatus\\r\\nPeer: gawel\\r\\n\\r\\n
+        out 1437920906.223456 22
+        Action: Ping\\r\\n\\r\\n
+
+    Options:
+
+    - ``max_bytes``: rotate the file when it reaches this size (before
+      compression). The size of an existing file counts
+    - ``rotate_interval``: rotate the file every ``rotate_interval`` seconds
+    - ``backup_count``: number of rotated files to keep (``path.1``,
+      ``path.2``, ...)
+    - ``compress``: gzip the file. Default to True if path ends with ``.gz``
+    - ``flush_interval``: flush buffered data to disk at least every
+      ``flush_interval`` seconds
+
+    Use it with a :class:`~panoramisk.Manager`::
+
+        manager = Manager(save_stream=StreamRecorder('ami.cap.gz',
+                                                     max_bytes=2 ** 30))
+
+    Passing a path as ``save_stream`` creates a recorder with the default
+    options.
+    """
+
+    magic = b'PANORAMISK-CAPTURE 1\n'
+
+    def __init__(self, path, max_bytes=None, rotate_interval=None,
+                 backup_count=5, compress=None, flush_interval=1.,
+                 buffer_size=65536):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        if compress is None:
+            compress = path.endswith('.gz')
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+
+    def record(self, direction, data):
+        """Queue a chunk of data. Called from the event loop"""
+        if self.thread is None:
+            self.start()
+        self.queue.put((direction, time.time(), bytes(data)))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run,
+                                       name='panoramisk-recorder',
+                                       daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Write pending records and close the file"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def open(self):
+        size = os.path.exists(self.path) and os.path.getsize(self.path)
+        if self.compress:
+            fd = io.BufferedWriter(gzip.open(self.path, 'ab'),
+                                   self.buffer_size)
+        else:
+            fd = open(self.path, 'ab', buffering=self.buffer_size)
+        if not size:
+            fd.write(self.magic)
+        return fd
+
+    def rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = '%s.%d' % (self.path, i)
+            if os.path.exists(src):
+                os.replace(src, '%s.%d' % (self.path, i + 1))
+        if self.backup_count:
+            os.replace(self.path, self.path + '.1')
+        else:
+            os.remove(self.path)
+
+    def run(self):
+        fd = None
+        written = opened_at = flushed_at = 0
+        # records not flushed yet, lost if the file fails
+        buffered = lost = 0
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            try:
+                if item:
+                    lost = 1
+                    direction, timestamp, data = item
+                    if fd is None:
+                        # the file may already exist
+                        written = (os.path.exists(self.path) and
+                                   os.path.getsize(self.path))
+                        fd = self.open()
+                        opened_at = timestamp
+                    if ((self.max_bytes and written and
+                         written + len(data) > self.max_bytes) or
+                            (self.rotate_interval and
+                             timestamp - opened_at > self.rotate_interval)):
+                        fd.close()
+                        fd = None
+                        buffered = 0
+                        self.rotate()
+                        fd = self.open()
+                        written = 0
+                        opened_at = timestamp
+                    header = b'%s %.6f %d\n' % (direction.encode('ascii'),
+                                                timestamp, len(data))
+                    fd.write(header)
+                    fd.write(data)
+                    fd.write(b'\n')
+                    written += len(header) + len(data) + 1
+                    buffered += 1
+                    lost = 0
+                now = time.monotonic()
+                if fd is not None and (
+                        item is None or now - flushed_at >= self.flush_interval):
+                    fd.flush()
+                    flushed_at = now
+                    buffered = 0
+            except OSError:
+                log.exception('Fail to record AMI stream to %s. '
+                              'Records dropped: %d', self.path,
+                              buffered + lost)
+                buffered = lost = 0
+                if fd is not None:
+                    try:
+                        fd.close()
+                    except OSError:
+                        pass
+                    fd = None
+            if item is None:
+                break
+        if fd is not None:
+            fd.close()
+
+
+class Capture:
+    """Load a capture written by :class:`StreamRecorder`. The file is
+    memory-mapped (or decompressed in memory if gzipped) and indexed once.
+    Iterating over it yields ``(direction, timestamp, data)`` tuples.
+
+    Files without the capture header, like raw AMI dumps, are seen as one
+    incoming record without timestamp.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fd:
+            if fd.read(2) == b'\x1f\x8b':
+                fd.seek(0)
+                with gzip.open(fd) as gz:
+                    self.data = gz.read()
+            elif os.fstat(fd.fileno()).st_size:
+                self.data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = b''
+        self.records = self.index()
+
+    @property
+    def is_capture(self):
+        magic = StreamRecorder.magic
+        return self.data[:len(magic)] == magic
+
+    def index(self):
+        data = self.data
+        size = len(data)
+        if not self.is_capture:
+            return [('in', None, 0, size)]
+        records = []
+        pos = len(StreamRecorder.magic)
+        while pos < size:
+            end = data.find(b'\n', pos)
+            try:
+                direction, timestamp, length = data[pos:end].split()
+                start = end + 1
+                stop = start + int(length)
+            except ValueError:
+                log.error('Invalid record at %s:%d', self.path, pos)
+                break
+            if end == -1 or stop > size:
+                log.warning('Truncated record at %s:%d', self.path, pos)
+                break
+            records.append((direction.decode('ascii'), float(timestamp),
+                            start, stop))
+            pos = stop + 1
+        return records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        data = self.data
+        for direction, timestamp, start, stop in self.records:
+            yield direction, timestamp, data[start:stop]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class RawStream:
+    """Write incoming data to a file like object as is"""
+
+    def __init__(self, fd, encoding='utf8'):
+        self.fd = fd
+        self.encoding = encoding
+
+    def record(self, direction, data):
+        if direction == 'in':
+            if isinstance(self.fd, io.TextIOBase):
+                data = data.decode(self.encoding, 'ignore')
+            self.fd.write(data)
+
+    def close(self):
+        pass
+
+
+def recorder(save_stream, encoding='utf8'):
+    """Return a recorder for the ``save_stream`` option of a Manager"""
+    if save_stream is None or hasattr(save_stream, 'record'):
+        return save_stream
+    elif hasattr(save_stream, 'write'):
+        return RawStream(save_stream, encoding=encoding)
+    return StreamRecorder(save_stream)
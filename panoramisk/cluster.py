@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from collections import defaultdict
+
+from . import actions
+from .manager import EventPatterns
+from .manager import Manager
+
+
+class ClusterMember(Manager):
+    """A Manager connected to one node of a :class:`ManagerCluster`. It use
+    the event table of the cluster and tag events with its node name"""
+
+    def __init__(self, cluster, name, **config):
+        super(ClusterMember, self).__init__(**config)
+        self.cluster = cluster
+        self.name = name
+        # share the dispatch table of the cluster
+        self.callbacks = cluster.callbacks
+        self.patterns = cluster.patterns
+        self.patterns_table = cluster.patterns_table
+        self.patterns_cache = cluster.patterns_cache
+
+    def dispatch(self, event):
+        event.node = self.name
+        return super(ClusterMember, self).dispatch(event)
+
+
+class ManagerCluster:
+    """Own one :class:`~panoramisk.Manager` per Asterisk node on a single
+    loop. Events of all nodes share one dispatch table. Each event has a
+    ``node`` attribute and callbacks receive the Manager of the node:
+
+    .. code-block:: python
+
+        cluster = ManagerCluster({
+            'pbx1': {'host': '10.0.0.1'},
+            'pbx2': {'host': '10.0.0.2'},
+        }, username='username', secret='secret')
+
+        @cluster.register_event('PeerStatus')
+        def callback(manager, event):
+            print(event.node, event.peer)
+
+        await cluster.connect()
+        results = await cluster.send_action_all({'Action': 'CoreStatus'},
+                                                timeout=5)
+
+    ``nodes`` is a dict of node names and their own options. Other options
+    are shared by all nodes. A shared ``save_stream`` path is suffixed with
+    the node name so each node records to its own file
+    (``ami.cap.gz`` becomes ``ami.cap.pbx1.gz``).
+    """
+
+    member_factory = ClusterMember
+
+    def __init__(self, nodes, **config):
+        self.config = config
+        self.loop = config.get('loop')
+        self.log = config.get('log', logging.getLogger(__name__))
+        self.callbacks = defaultdict(list)
+        self.patterns = []
+        self.patterns_table = EventPatterns()
+        self.patterns_cache = {}
+        self.members = OrderedDict()
+        for name, node_config in nodes.items():
+            member_config = dict(config, **node_config)
+            path = config.get('save_stream')
+            if isinstance(path, str) and 'save_stream' not in node_config:
+                root, ext = os.path.splitext(path)
+                member_config['save_stream'] = '%s.%s%s' % (root, name, ext)
+            self.members[name] = self.member_factory(
+                self, name, **member_config)
+        self.register_event('FullyBooted', self.send_awaiting_actions)
+
+    register_event = Manager.register_event
+    resolve_callbacks = Manager.resolve_callbacks
+    has_callbacks = Manager.has_callbacks
+
+    def __getitem__(self, name):
+        return self.members[name]
+
+    def __iter__(self):
+        return iter(self.members.values())
+
+    def __len__(self):
+        return len(self.members)
+
+    def send_awaiting_actions(self, member, event):
+        return member.send_awaiting_actions()
+
+    def connect(self):
+        """Connect all nodes. Return a future done when all connection
+        attempts are done"""
+        if self.loop is None:  # pragma: no cover
+            self.loop = asyncio.get_event_loop()
+        for member in self:
+            member.loop = self.loop
+        return asyncio.gather(*[member.connect() for member in self])
+
+    def send_action(self, node, action, as_list=None, **kwargs):
+        """Send an action to one node"""
+        return self.members[node].send_action(action, as_list=as_list,
+                                              **kwargs)
+
+    async def send_action_all(self, action, as_list=None, timeout=None,
+                              nodes=None, **kwargs):
+        """Send an action to all nodes (or to ``nodes``) concurrently.
+
+        Return a dict of node names and results. Nodes which failed or did
+        not answer before ``timeout`` seconds get an exception as result
+        (:class:`asyncio.TimeoutError` on timeout)
+        """
+        names = list(self.members) if nodes is None else list(nodes)
+        action = dict((k, v) for k, v in dict(action, **kwargs).items()
+                      if k.lower() != 'actionid')
+        results = await asyncio.gather(*[
+            self.wait_action(self.members[name], action, as_list, timeout)
+            for name in names], return_exceptions=True)
+        return OrderedDict(zip(names, results))
+
+    async def wait_action(self, member, action, as_list, timeout):
+        action = actions.Action(action, as_list=as_list)
+        action = member.send_action(action, as_list=as_list)
+        try:
+            return await asyncio.wait_for(action, timeout)
+        except asyncio.TimeoutError:
+            self.log.warning('No response from %s after %ss',
+                             member.name, timeout)
+            raise
+        finally:
+            if member.protocol is not None:
+                member.protocol.forget(action)
+
+    def close(self):
+        """Close all nodes"""
+        for member in self:
+            member.close()
@@ -1,3 +1,6 @@
+import asyncio
+
+
 class AGIException(Exception):
     """The base exception for all AGI-related exceptions.
     """
@@ -45,3 +48,12 @@ class AGIInvalidCommand(AGIError):
 class AGIUsageError(AGIError):
     """Indicates that a request made to Asterisk was sent with invalid syntax.
     """
+
+
+class ActionTimeoutError(asyncio.TimeoutError):
+    """Indicates that an AMI action did not get all its responses in time.
+    """
+
+    def __init__(self, message, action):
+        asyncio.TimeoutError.__init__(self, message)
+        self.action = action  # The Action with the responses received, if any
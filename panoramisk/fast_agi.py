@@ -35,7 +35,53 @@ class Request:
         command += '\n'
         self.writer.write(command.encode(self.encoding))
         await self.writer.drain()
+        return await self._read_command_result()
 
+    async def pipeline(self, commands):
+        """Send several commands for FastAGI request in a single write, then
+        read their responses in order:
+
+        :param commands: Commands to launch on FastAGI request.
+        :type commands: list of String
+        :return: a list of results, one per command
+
+        :Example:
+
+        ::
+
+            async def call_waiting(request):
+                await request.pipeline([
+                    'ANSWER',
+                    'SET VARIABLE CALLER "x"',
+                    'STREAM FILE welcome ""',
+                ])
+
+        Each response is handled like :meth:`send_command` would. If
+        ``raise_on_error`` is set, all responses are still read and the first
+        error is raised.
+        """
+        data = ''.join(command + '\n' for command in commands)
+        self.writer.write(data.encode(self.encoding))
+        await self.writer.drain()
+
+        results = []
+        error = None
+        for command in commands:
+            try:
+                results.append(await self._read_command_result())
+            except AGIException as err:
+                if error is None:
+                    error = err
+        if error is not None:
+            raise error
+        return results
+
+    async def _read_command_result(self):
+        """Read the response of a command, waiting for the final one if
+        Asterisk returns `100 Trying...`
+
+        :return dict: The AGI response parsed into a dict.
+        """
         try:
             agi_result = await self._read_result()
             # If Asterisk returns `100 Trying...`, wait for next the response.
@@ -77,14 +123,18 @@ class Application(dict):
         >>> fa_app = Application()
     """
 
-    buf_size = 100
+    max_header_size = 65536
 
     def __init__(
-            self, default_encoding='utf-8', loop=None, raise_on_error=False, decode_errors='strict'
+            self, default_encoding='utf-8', loop=None, raise_on_error=False, decode_errors='strict',
+            header_timeout=None, max_header_size=None
     ):
         super(Application, self).__init__()
         self.default_encoding = default_encoding
         self.decode_errors = decode_errors
+        self.header_timeout = header_timeout
+        if max_header_size is not None:
+            self.max_header_size = max_header_size
         if loop is None:
             try:
                 loop = asyncio.get_running_loop()
@@ -144,6 +194,41 @@ class Application(dict):
             raise ValueError('This route doesn\'t exist.')
         del self._route[path]
 
+    async def read_headers(self, reader):
+        """Read the AGI variables sent by Asterisk at the beginning of a
+        FastAGI request.
+
+        Return an ordered dict of headers or None if the headers are too
+        large (see ``max_header_size``), are not received before
+        ``header_timeout`` seconds or if the connection is closed.
+
+        The limit of the :class:`asyncio.StreamReader` (64 KiB by default)
+        also applies.
+        """
+        try:
+            if self.header_timeout is None:
+                buffer = await reader.readuntil(b'\n\n')
+            else:
+                buffer = await asyncio.wait_for(reader.readuntil(b'\n\n'),
+                                                self.header_timeout)
+        except asyncio.TimeoutError:
+            log.error('No FastAGI headers received after %ss',
+                      self.header_timeout)
+            return None
+        except asyncio.IncompleteReadError:
+            log.error('Connection closed while reading FastAGI headers')
+            return None
+        except asyncio.LimitOverrunError:
+            log.error('FastAGI headers exceed the stream limit')
+            return None
+        if len(buffer) > self.max_header_size:
+            log.error('FastAGI headers exceed %d bytes', self.max_header_size)
+            return None
+        lines = buffer[:-2].decode(self.default_encoding, errors=self.decode_errors).split('\n')
+        return OrderedDict([
+            line.split(': ', 1) for line in lines if ': ' in line
+        ])
+
     async def handler(self, reader, writer):
         """AsyncIO coroutine handler to launch socket listening.
 
@@ -162,13 +247,10 @@ class Application(dict):
 
         See https://docs.python.org/3/library/asyncio-stream.html
         """
-        buffer = b''
-        while b'\n\n' not in buffer:
-            buffer += await reader.read(self.buf_size)
-        lines = buffer[:-2].decode(self.default_encoding, errors=self.decode_errors).split('\n')
-        headers = OrderedDict([
-            line.split(': ', 1) for line in lines if ': ' in line
-        ])
+        headers = await self.read_headers(reader)
+        if headers is None:
+            writer.close()
+            return
 
         agi_network_script = headers.get('agi_network_script')
         log.info('Received FastAGI request from %r for "%s" route',
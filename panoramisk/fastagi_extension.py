@@ -3,8 +3,7 @@ import inspect
 from urllib.parse import urlparse,parse_qs
 import asyncio
 import time
-from functools import wraps
-from collections import OrderedDict
+from functools import lru_cache, wraps
 from dataclasses import dataclass
 from . import fast_agi
 import logging
@@ -52,6 +51,11 @@ def get_path_before_query(url):
         return None
 
 
+@lru_cache(maxsize=None)
+def _class_type_hints(cls):
+    return get_type_hints(cls)
+
+
 class ArgModel:
     """
     usage:
@@ -70,7 +74,7 @@ class ArgModel:
 
         """convert into he actual type"""
 
-        hints = get_type_hints(self.__class__)
+        hints = _class_type_hints(self.__class__)
 
         for f, typ in hints.items():
             value = getattr(self,f)
@@ -96,11 +100,68 @@ class AgiRouter:
         return decorator
 
 
+class RouteBinding:
+    """
+    Resolve the signature and the type hints of a route once and bind
+    the arguments of each request with it.
+    """
+
+    def __init__(self, callback):
+        sig = inspect.signature(callback)
+        type_hints = get_type_hints(callback)
+        self.names = set()
+        self.accepts_kwargs = False
+        self.defaults = {}
+        self.requests = []
+        self.models = []
+        self.converters = {}
+        for name, param in sig.parameters.items():
+            if param.kind == param.VAR_KEYWORD:
+                self.accepts_kwargs = True
+                continue
+            elif param.kind == param.VAR_POSITIONAL:
+                continue
+            self.names.add(name)
+            if param.default is not param.empty:
+                self.defaults[name] = param.default
+            expected_type = type_hints.get(name)
+            if not isinstance(expected_type, type):
+                continue
+            elif issubclass(expected_type, Request):
+                self.requests.append(name)
+            elif issubclass(expected_type, ArgModel):
+                self.models.append((name, expected_type))
+            elif expected_type is not list:
+                self.converters[name] = expected_type
+
+    def bind(self, request):
+        """
+        Return the keyword arguments used to call the route.
+        """
+        arguments = dict(self.defaults)
+        for name, value in request.query_params.items():
+            if name not in self.names and not self.accepts_kwargs:
+                raise TypeError(f"got an unexpected keyword argument '{name}'")
+            converter = self.converters.get(name)
+            if converter is not None and isinstance(value, list):
+                try:
+                    value = converter(value[0])
+                except Exception:
+                    pass  # keep original if conversion fails
+            arguments[name] = value
+        for name in self.requests:
+            arguments[name] = request
+        for name, model in self.models:
+            arguments[name] = model(*request.args)
+        return arguments
+
 
 class FastAgi(fast_agi.Application):
 
-    def __init__(self, default_encoding='utf-8', loop=None, raise_on_error=False, decode_errors='strict'):
-        super().__init__(default_encoding, loop, raise_on_error, decode_errors)
+    def __init__(self, default_encoding='utf-8', loop=None, raise_on_error=False, decode_errors='strict',
+                 header_timeout=None, max_header_size=None):
+        super().__init__(default_encoding, loop, raise_on_error, decode_errors,
+                         header_timeout, max_header_size)
 
     async def start_server(self, host: str= '127.0.0.1', port: int = 4574):
         self.server = await asyncio.start_server(self.handler,host,port)
@@ -110,12 +171,10 @@ class FastAgi(fast_agi.Application):
         
         def decorator(callback):
             
+            binding = RouteBinding(callback)
+
             @wraps(callback)
             async def wrapper(raw_rqt:fast_agi.Request):
-                sig = inspect.signature(callback)
-
-                type_hints = get_type_hints(callback)
-
                 request = Request(
                         raw_rqt.app,
                         raw_rqt.headers,
@@ -123,35 +182,12 @@ class FastAgi(fast_agi.Application):
                         raw_rqt.writer,
                         raw_rqt.encoding,
                 )
-
-                request_key = {k: request for  k,v in  type_hints.items() if  v==Request }
-                arg_model = {k: model(*request.args) for  k,model in  type_hints.items() if  issubclass(model,ArgModel) }
                 try:
-                    bind = sig.bind_partial(**request.query_params,**request_key,**arg_model)
+                    arguments = binding.bind(request)
                 except TypeError as e:
                     log.error(str(e))
                     raise
-
-                bind.apply_defaults()
-
-                # Convert types according to type hints
-                for name, value in bind.arguments.items():
-
-                    expected_type = type_hints.get(name)
-                    if expected_type == Request or issubclass(expected_type,ArgModel):
-                        continue
-
-                    if expected_type and value is not None:
-                        try:
-                            if expected_type is not list and isinstance(value, list):
-                                bind.arguments[name] = expected_type(value[0])
-                        except Exception:
-                            pass  # keep original if conversion fails  
-                try:
-                    msg = await callback(**bind.arguments)
-                    return msg
-                except TypeError:
-                    raise
+                return await callback(**arguments)
 
             self.add_route(path,wrapper)
             log.info(f"Added [{callback}] to the path '{path}'")
@@ -184,13 +220,10 @@ class FastAgi(fast_agi.Application):
 
         See https://docs.python.org/3/library/asyncio-stream.html
         """
-        buffer = b''
-        while b'\n\n' not in buffer:
-            buffer += await reader.read(self.buf_size)
-        lines = buffer[:-2].decode(self.default_encoding, errors=self.decode_errors).split('\n')
-        headers = OrderedDict([
-            line.split(': ', 1) for line in lines if ': ' in line
-        ])
+        headers = await self.read_headers(reader)
+        if headers is None:
+            writer.close()
+            return
 
         agi_network_script = get_path_before_query(headers.get('agi_network_script'))
 
@@ -6,10 +6,76 @@ from collections import deque
 import re
 import fnmatch
 from .ami_protocol import AMIProtocol
+from .message import LazyMessage
 from . import actions
+from . import capture
+from . import scheduler
 from . import utils
 
 
+class EventPatterns:
+    """Compiled lookup table for event patterns. Literal patterns are stored
+    in a dict, ``Prefix*`` patterns in a prefix tree and all other patterns
+    are combined in one regexp:
+
+    .. code-block:: python
+
+        >>> patterns = EventPatterns()
+        >>> for pattern in ('Peer*', 'PeerStatus', '*Status', 'Meetme*'):
+        ...     patterns.add(pattern)
+        >>> patterns.match('PeerStatus')
+        ['Peer*', 'PeerStatus', '*Status']
+        >>> patterns.match('MeetmeEnd')
+        ['Meetme*']
+        >>> patterns.match('Newexten')
+        []
+
+    Matching patterns are returned in registration order.
+    """
+
+    wildcards = ('*', '?', '[')
+
+    def __init__(self):
+        self.patterns = []
+        self.exact = {}
+        self.prefixes = {}
+        self.regexps = []
+        self.regexp = None
+
+    def add(self, pattern):
+        index = len(self.patterns)
+        self.patterns.append(pattern)
+        if not any(c in pattern for c in self.wildcards):
+            self.exact.setdefault(pattern, []).append(index)
+        elif (pattern.endswith('*') and
+                not any(c in pattern[:-1] for c in self.wildcards)):
+            node = self.prefixes
+            for char in pattern[:-1]:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(index)
+        else:
+            regexp = fnmatch.translate(pattern)
+            self.regexps.append((index, re.compile(regexp)))
+            self.regexp = re.compile('|'.join(
+                '(?:%s)' % r.pattern for i, r in self.regexps))
+
+    def match(self, name):
+        indexes = list(self.exact.get(name, ()))
+        node = self.prefixes
+        for char in name:
+            indexes.extend(node.get(None, ()))
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            indexes.extend(node.get(None, ()))
+        if self.regexp is not None and self.regexp.match(name) is not None:
+            indexes.extend(i for i, r in self.regexps
+                           if r.match(name) is not None)
+        indexes.sort()
+        return [self.patterns[i] for i in indexes]
+
+
 class Manager:
     """Main object:
 
@@ -32,9 +98,18 @@ class Manager:
         ping_interval=10,
         reconnect_timeout=2,
         protocol_factory=AMIProtocol,
+        message_class=LazyMessage,
+        prefilter_events=True,
         save_stream=None,
         loop=None,
         forgetable_actions=('ping', 'login'),
+        rate_limit=None,
+        rate_burst=None,
+        max_in_flight=None,
+        control_actions=None,
+        action_timeout=None,
+        coalesce_writes=False,
+        coalesce_max_bytes=65536,
     )
 
     def __init__(self, **config):
@@ -44,7 +119,16 @@ class Manager:
         self.callbacks = defaultdict(list)
         self.protocol = None
         self.patterns = []
+        self.patterns_table = EventPatterns()
+        self.patterns_cache = {}
+        self.skipped_frames = 0
+        self.timed_out_actions = 0
+        self.action_timeout = self.config['action_timeout']
+        if self.action_timeout is not None:
+            self.action_timeout = float(self.action_timeout)
         self.save_stream = self.config.get('save_stream')
+        self.recorder = capture.recorder(self.save_stream,
+                                         encoding=self.config['encoding'])
         self.authenticated = False
         self.authenticated_future = None
         self.awaiting_actions = deque()
@@ -78,11 +162,26 @@ class Manager:
             self.log.debug('Manager connected')
             self.loop.call_soon(self.on_connect, self)
             self.protocol = protocol
-            self.protocol.queue = deque()
             self.protocol.factory = self
             self.protocol.log = self.log
             self.protocol.config = self.config
             self.protocol.encoding = self.encoding = self.config['encoding']
+            self.protocol.message_class = self.config['message_class']
+            self.protocol.prefilter = self.config['prefilter_events']
+            self.protocol.recorder = self.recorder
+            self.protocol.action_timeout = self.action_timeout
+            self.protocol.loop = self.loop
+            self.protocol.coalesce_writes = bool(
+                self.config['coalesce_writes'])
+            self.protocol.coalesce_max_bytes = int(
+                self.config['coalesce_max_bytes'])
+            if self.config['rate_limit'] or self.config['max_in_flight']:
+                self.protocol.scheduler = scheduler.OutboundScheduler(
+                    self.protocol, self.loop,
+                    rate=self.config['rate_limit'],
+                    burst=self.config['rate_burst'],
+                    max_in_flight=self.config['max_in_flight'],
+                    control_actions=self.config['control_actions'])
             self.responses = self.protocol.responses = {}
             if 'username' in self.config:
                 if self.auth_type is not None:
@@ -130,7 +229,7 @@ class Manager:
 
     def ping(self):  # pragma: no cover
         self.pinger = self.loop.call_later(self.ping_interval, self.ping)
-        self.protocol.send({'Action': 'Ping'})
+        self.send_action({'Action': 'Ping'}, wait=False)
 
     async def send_awaiting_actions(self, *_):
         self.log.info('Sending awaiting actions')
@@ -140,7 +239,7 @@ class Manager:
                 if not action.done():
                     self.send_action(action, as_list=action.as_list)
 
-    def send_action(self, action, as_list=None, **kwargs):
+    def send_action(self, action, as_list=None, wait=True, **kwargs):
         """Send an :class:`~panoramisk.actions.Action` to the server:
 
         :param action: an Action or dict with action name and parameters to
@@ -148,7 +247,11 @@ class Manager:
         :type action: Action or dict or Command
         :param as_list: If True, the action will retrieve all responses
         :type as_list: boolean
-        :return: an Action that will receive the response(s)
+        :param wait: If False, the action is written without ActionID and
+                     its responses are ignored
+        :type wait: boolean
+        :return: an Action that will receive the response(s) or None if
+                 ``wait`` is False
         :rtype: panoramisk.actions.Action
 
         :Example:
@@ -164,12 +267,31 @@ class Manager:
             async for resp in  manager.send_action({'Action': 'Status'}):
                 print(resp)
 
+        Fire and forget::
+
+            manager.send_action({'Action': 'UserEvent',
+                                 'UserEvent': 'Deployed'}, wait=False)
+
         See https://wiki.asterisk.org/wiki/display/AST/AMI+Actions for
         more information on actions
         """
         action.update(kwargs)
+        if not wait:
+            return self.protocol.send_nowait(action)
         return self.protocol.send(action, as_list=as_list)
 
+    def send_actions(self, actions, as_list=None):
+        """Send several actions with a single write to the transport. Return
+        a list of :class:`~panoramisk.actions.Action`::
+
+            manager = Manager()
+            dbget = ActionTemplate({'Action': 'DBGet', 'Family': 'cidname'})
+            for action in manager.send_actions(
+                    [dbget.action(Key=key) for key in keys]):
+                resp = await action
+        """
+        return self.protocol.send_many(actions, as_list=as_list)
+
     def send_command(self, command, as_list=False):
         """Send a :class:`~panoramisk.actions.Command` to the server::
 
@@ -267,26 +389,59 @@ class Manager:
             if not self.callbacks[pattern]:
                 self.patterns.append((pattern,
                                      re.compile(fnmatch.translate(pattern))))
+                self.patterns_table.add(pattern)
             self.callbacks[pattern].append(callback)
+            self.patterns_cache.clear()
             return callback
         if callback is not None:
             return _register_event(callback)
         else:
             return _register_event
 
+    def resolve_callbacks(self, event_name):
+        """Return a list of ``(pattern, callbacks)`` for an event name. The
+        result is cached until a new pattern is registered"""
+        try:
+            return self.patterns_cache[event_name]
+        except KeyError:
+            resolved = [(pattern, self.callbacks[pattern])
+                        for pattern in self.patterns_table.match(event_name)]
+            self.patterns_cache[event_name] = resolved
+            return resolved
+
+    def has_callbacks(self, event_name):
+        """Return True if at least one registered pattern match the event
+        name:
+
+        .. code-block:: python
+
+            >>> manager = Manager()
+            >>> manager.has_callbacks('MeetmeJoin')
+            False
+            >>> manager.register_event('Meetme*', print)
+            <built-in function print>
+            >>> manager.has_callbacks('MeetmeJoin')
+            True
+        """
+        return bool(self.resolve_callbacks(event_name))
+
     def dispatch(self, event):
-        matches = []
         event.manager = self
-        for pattern, regexp in self.patterns:
-            match = regexp.match(event.event)
-            if match is not None:
-                matches.append(pattern)
-                for callback in self.callbacks[pattern]:
-                    ret = callback(self, event)
-                    if (asyncio.iscoroutine(ret) or
-                            isinstance(ret, asyncio.Future)):
-                        asyncio.ensure_future(ret, loop=self.loop)
-        return matches
+        resolved = self.resolve_callbacks(event.event)
+        for pattern, callbacks in resolved:
+            for callback in callbacks:
+                ret = callback(self, event)
+                if (asyncio.iscoroutine(ret) or
+                        isinstance(ret, asyncio.Future)):
+                    asyncio.ensure_future(ret, loop=self.loop)
+        return [pattern for pattern, callbacks in resolved]
+
+    @property
+    def outstanding_actions(self):
+        """Number of actions waiting for their responses"""
+        if self.protocol is None:
+            return 0
+        return self.protocol.outstanding
 
     def close(self):
         """Close the connection"""
@@ -295,6 +450,8 @@ class Manager:
             self.pinger = None
         if getattr(self, 'protocol', None):
             self.protocol.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
     def connection_lost(self, exc):
         self._connected = False
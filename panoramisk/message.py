@@ -36,8 +36,11 @@ class Message(utils.CaseInsensitiveDict):
 
     """
 
+    __slots__ = ('manager', '__dict__')
+
     quoted_keys = ['result']
     success_responses = ['Success', 'Follows', 'Goodbye']
+    has_body = ('Response: Follows', 'Response: Fail')
 
     def __init__(self, headers, content=''):
         super(Message, self).__init__(headers, content=content)
@@ -119,12 +122,12 @@ class Message(utils.CaseInsensitiveDict):
         return result
 
     @classmethod
-    def from_line(cls, line):
+    def parse_line(cls, line):
+        """Split a raw AMI frame into a ``(headers, content)`` tuple"""
         mlines = line.split(utils.EOL)
         headers = {}
         content = ''
-        has_body = ('Response: Follows', 'Response: Fail')
-        if mlines[0].startswith(has_body):
+        if mlines[0].startswith(cls.has_body):
             content = mlines.pop()
             while not content and mlines:
                 content = mlines.pop()
@@ -141,5 +144,134 @@ class Message(utils.CaseInsensitiveDict):
                     headers[k] = o
                 else:
                     headers[k] = v
+        return headers, content
+
+    @classmethod
+    def from_line(cls, line):
+        headers, content = cls.parse_line(line)
+        if 'Event' in headers or 'Response' in headers:
+            return cls(headers, content)
+
+
+class LazyMessage(Message):
+    """A :class:`Message` which only extracts the ``Event``, ``Response``,
+    ``ActionID``, ``CommandID`` and ``SubEvent`` headers when it's created.
+    Other headers are parsed the first time they are accessed:
+
+    .. code-block:: python
+
+        >>> event = LazyMessage.from_line(
+        ...     'Event: Newexten' + utils.EOL + 'Channel: SIP/gawel')
+        >>> print(event.event)
+        Newexten
+        >>> event.parsed
+        False
+        >>> print(event.channel)
+        SIP/gawel
+        >>> event.parsed
+        True
+
+    It can also be created from parsed headers, like a :class:`Message`.
+    The raw frame is released once parsed.
+    """
+
+    __slots__ = ('line', 'eager')
+
+    eager_keys = ('Event', 'Response', 'ActionID', 'CommandID', 'SubEvent')
+
+    def __init__(self, headers=None, content='', line=None, eager=None):
+        self.manager = None
+        if headers is not None:
+            self.set_headers(headers, content)
+        else:
+            self.line = line
+            self.eager = eager
+            self._values = None
+            self._keys = None
+
+    @property
+    def parsed(self):
+        return self._values is not None
+
+    def parse(self):
+        self.set_headers(*self.parse_line(self.line))
+
+    def set_headers(self, headers, content):
+        utils.CaseInsensitiveDict.__init__(self, headers, content=content)
+        self.line = None
+        self.eager = None
+
+    def __contains__(self, key):
+        if self.eager is not None:
+            lkey = utils.lowered_keys.get(key) or key.lower()
+            if lkey in self.eager:
+                return self.eager[lkey] is not None
+        if self._values is None:
+            self.parse()
+        return super(LazyMessage, self).__contains__(key)
+
+    def __getitem__(self, key):
+        if self.eager is not None:
+            lkey = utils.lowered_keys.get(key) or key.lower()
+            if lkey in self.eager:
+                value = self.eager[lkey]
+                if value is None:
+                    raise KeyError(key)
+                return value
+        if self._values is None:
+            self.parse()
+        return super(LazyMessage, self).__getitem__(key)
+
+    def __setitem__(self, key, value):
+        if self._values is None:
+            self.parse()
+        super(LazyMessage, self).__setitem__(key, value)
+
+    def __iter__(self):
+        if self._values is None:
+            self.parse()
+        return super(LazyMessage, self).__iter__()
+
+    def __len__(self):
+        if self._values is None:
+            self.parse()
+        return super(LazyMessage, self).__len__()
+
+    @classmethod
+    def from_line(cls, line):
+        if line.startswith(cls.has_body):
+            # the body may look like headers. Don't try to be smart
+            return cls.from_parsed_line(line)
+        eol = utils.EOL
+        text = eol + line
+        lowered = None
+        eager = {}
+        for key in cls.eager_keys:
+            prefix = eol + key + ': '
+            start = text.find(prefix)
+            if start == -1:
+                if lowered is None:
+                    lowered = text.lower()
+                if prefix.lower() in lowered:
+                    # unusual case (like CommandId). Let the full parser
+                    # handle it
+                    return cls.from_parsed_line(line)
+                eager[key.lower()] = None
+                continue
+            start += len(prefix)
+            end = text.find(eol, start)
+            if end == -1:
+                end = len(text)
+            if text.find(prefix, end) != -1:
+                # multi values header. Let the full parser handle it
+                return cls.from_parsed_line(line)
+            eager[key.lower()] = text[start:end]
+        if eager['event'] is None and eager['response'] is None:
+            return None
+        return cls(line=line, eager=eager)
+
+    @classmethod
+    def from_parsed_line(cls, line):
+        headers, content = cls.parse_line(line)
         if 'Event' in headers or 'Response' in headers:
             return cls(headers, content)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from itertools import count
+
+from .manager import Manager
+
+
+class ManagerPool:
+    """Keep several AMI sessions to the same server and spread actions
+    between them.
+
+    The first member logs in with ``events='on'`` and receives all the
+    events. The others log in with ``events='off'`` and are only used to send
+    actions. Each action is sent through the healthy action session with the
+    least outstanding actions so a slow action (like a big ``Command``) does
+    not delay the following ones:
+
+    .. code-block:: python
+
+        pool = ManagerPool(pool_size=4, username='username',
+                           secret='secret')
+        await pool.connect()
+        resp = await pool.send_action({'Action': 'DBGet',
+                                       'Family': 'cidname',
+                                       'Key': '1234'})
+
+    Options (other options are passed to each member):
+
+    - ``pool_size``: number of sessions, including the event session
+    - ``health_check_interval``: ping each session every
+      ``health_check_interval`` seconds
+    - ``health_check_timeout``: reconnect a session which does not answer to
+      a ping in time
+
+    ``save_stream`` is only used by the event session.
+
+    Actions completed by a broadcast event (``AGI`` and ``Originate`` with
+    ``Async: true``) are always sent through the event session since the
+    other sessions never receive their last response.
+    """
+
+    event_actions = frozenset(('agi',))
+
+    defaults = dict(
+        pool_size=3,
+        health_check_interval=10,
+        health_check_timeout=5,
+        manager_factory=Manager,
+    )
+
+    def __init__(self, **config):
+        self.config = dict(self.defaults, **config)
+        self.log = config.get('log', logging.getLogger(__name__))
+        pool_size = int(self.config.pop('pool_size'))
+        if pool_size < 1:
+            raise ValueError('Invalid pool_size: %r' % pool_size)
+        self.health_check_interval = float(
+            self.config.pop('health_check_interval'))
+        self.health_check_timeout = float(
+            self.config.pop('health_check_timeout'))
+        factory = self.config.pop('manager_factory')
+        self.events_manager = factory(**self.config)
+        self.loop = self.events_manager.loop
+        action_config = dict(self.config, events='off', save_stream=None,
+                             on_login=self.on_member_login)
+        self.action_managers = [factory(**action_config)
+                                for i in range(pool_size - 1)]
+        self.members = [self.events_manager] + self.action_managers
+        self.counter = count()
+        self.health_checker = None
+        self.failed_health_checks = 0
+
+    def connect(self):
+        """Connect all sessions. Return a future done when all connection
+        attempts are done"""
+        if self.loop is None:  # pragma: no cover
+            self.loop = asyncio.get_event_loop()
+        for member in self.members:
+            member.loop = self.loop
+        tasks = [member.connect() for member in self.members]
+        if self.health_checker is None and self.health_check_interval:
+            self.health_checker = self.loop.call_later(
+                self.health_check_interval, self.check_health)
+        return asyncio.gather(*tasks)
+
+    def on_member_login(self, member):
+        # sessions without events never receive FullyBooted
+        asyncio.ensure_future(member.send_awaiting_actions(), loop=self.loop)
+        on_login = self.config.get('on_login')
+        if on_login is not None:
+            on_login(member)
+
+    @staticmethod
+    def is_healthy(member):
+        protocol = member.protocol
+        return (member.authenticated and protocol is not None and
+                not protocol.closed)
+
+    def select(self):
+        """Return the healthy action session with the least outstanding
+        actions. Fallback to the event session"""
+        members = self.action_managers
+        if members:
+            offset = next(self.counter) % len(members)
+            members = members[offset:] + members[:offset]
+        healthy = [m for m in members if self.is_healthy(m)]
+        if not healthy:
+            return self.events_manager
+        return min(healthy, key=lambda m: m.protocol.outstanding)
+
+    def needs_events(self, action, **kwargs):
+        """Return True if the action is completed by a broadcast event"""
+        name = is_async = ''
+        for headers in (action, kwargs):
+            for key, value in headers.items():
+                key = key.lower()
+                if key == 'action':
+                    name = str(value).lower()
+                elif key == 'async':
+                    is_async = str(value).lower()
+        if name in self.event_actions:
+            return True
+        return name == 'originate' and is_async == 'true'
+
+    def send_action(self, action, as_list=None, **kwargs):
+        """Send an action through the less busy session. See
+        :meth:`~panoramisk.Manager.send_action`"""
+        if self.needs_events(action, **kwargs):
+            manager = self.events_manager
+        else:
+            manager = self.select()
+        return manager.send_action(action, as_list=as_list, **kwargs)
+
+    def send_command(self, command, as_list=False):
+        """See :meth:`~panoramisk.Manager.send_command`"""
+        return self.select().send_command(command, as_list=as_list)
+
+    def send_agi_command(self, channel, command, as_list=False):
+        """See :meth:`~panoramisk.Manager.send_agi_command`. AsyncAGI results
+        are events so they are sent through the event session"""
+        return self.events_manager.send_agi_command(channel, command,
+                                                    as_list=as_list)
+
+    def register_event(self, pattern, callback=None):
+        """Register an event on the event session. See
+        :meth:`~panoramisk.Manager.register_event`"""
+        return self.events_manager.register_event(pattern, callback)
+
+    def check_health(self):
+        """Ping all sessions. Sessions which do not answer before
+        ``health_check_timeout`` are reconnected"""
+        self.health_checker = self.loop.call_later(
+            self.health_check_interval, self.check_health)
+        for member in self.members:
+            if self.is_healthy(member):
+                ping = member.send_action({'Action': 'Ping'})
+                self.loop.call_later(self.health_check_timeout,
+                                     self.check_ping, member,
+                                     member.protocol, ping)
+
+    def check_ping(self, member, protocol, ping):
+        if ping.done() or protocol.closed:
+            return
+        self.failed_health_checks += 1
+        self.log.warning('No ping response after %ss. Reconnecting',
+                         self.health_check_timeout)
+        protocol.connection_lost(
+            asyncio.TimeoutError('Health check failed'))
+
+    def close(self):
+        """Close all sessions"""
+        if self.health_checker is not None:
+            self.health_checker.cancel()
+            self.health_checker = None
+        for member in self.members:
+            member.close()
@@ -0,0 +1,134 @@
+from collections import deque
+
+
+class OutboundScheduler:
+    """Control when actions are written to the transport.
+
+    Actions are split in two priority classes:
+
+    - control actions (``Hangup``, ``Redirect``, ``Ping``, ...) are written
+      as soon as possible
+    - other actions are bulk actions. They are written when a token is
+      available (at most ``rate`` actions per second with bursts of
+      ``burst`` actions) and when less than ``max_in_flight`` bulk actions
+      are waiting for their responses
+
+    Queued control actions are always written before bulk actions. Nothing
+    is written while the transport asks to pause writing.
+
+    The :class:`~panoramisk.Manager` creates a scheduler for each connection
+    when ``rate_limit`` or ``max_in_flight`` is set:
+
+    .. code-block:: python
+
+        manager = Manager(rate_limit=20, max_in_flight=50)
+    """
+
+    control_actions = frozenset((
+        'hangup', 'redirect', 'atxfer', 'blindtransfer', 'bridge', 'park',
+        'ping', 'login', 'logoff', 'challenge',
+    ))
+
+    def __init__(self, protocol, loop, rate=None, burst=None,
+                 max_in_flight=None, control_actions=None):
+        self.protocol = protocol
+        self.loop = loop
+        self.rate = float(rate) if rate else None
+        if burst is None:
+            burst = max(1., self.rate or 1.)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated_at = loop.time()
+        self.max_in_flight = int(max_in_flight) if max_in_flight else None
+        if control_actions is not None:
+            self.control_actions = frozenset(a.lower()
+                                             for a in control_actions)
+        self.control = deque()
+        self.bulk = deque()
+        self.in_flight = 0
+        self.paused = False
+        self.timer = None
+
+    def __len__(self):
+        return len(self.control) + len(self.bulk)
+
+    def is_control(self, name):
+        return name.lower() in self.control_actions
+
+    def submit(self, action, name=None):
+        """Write an action or queue it until it can be written. ``action``
+        can also be an action serialized to bytes. ``name`` is then required.
+        Such actions are rate limited but not counted as in flight since
+        nobody waits for their responses"""
+        if name is None:
+            name = action['action']
+        if self.is_control(name):
+            self.control.append(action)
+        else:
+            self.bulk.append(action)
+        self.drain()
+
+    def drain(self):
+        """Write queued actions allowed by the limits in one batch"""
+        batch = []
+        write = batch.append
+        control = self.control
+        bulk = self.bulk
+        while control and not self.paused:
+            write(control.popleft())
+        while bulk and not self.paused:
+            action = bulk[0]
+            tracked = not isinstance(action, bytes)
+            if tracked:
+                if action.done():  # cancelled while queued
+                    bulk.popleft()
+                    continue
+                if (self.max_in_flight and
+                        self.in_flight >= self.max_in_flight):
+                    # action_done() will drain again
+                    break
+            if self.rate:
+                now = self.loop.time()
+                self.tokens = min(
+                    self.burst,
+                    self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens < 1:
+                    if self.timer is None:
+                        self.timer = self.loop.call_later(
+                            (1 - self.tokens) / self.rate, self.wakeup)
+                    break
+                self.tokens -= 1
+            bulk.popleft()
+            if tracked:
+                self.in_flight += 1
+                action.add_done_callback(self.action_done)
+            write(action)
+        if len(batch) == 1:
+            self.protocol.write(batch[0])
+        elif batch:
+            self.protocol.writelines(batch)
+
+    def wakeup(self):
+        self.timer = None
+        self.drain()
+
+    def action_done(self, action):
+        self.in_flight -= 1
+        if self.bulk:
+            self.drain()
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.drain()
+
+    def close(self):
+        """Forget queued actions"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.control.clear()
+        self.bulk.clear()
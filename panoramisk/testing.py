@@ -1,7 +1,11 @@
 from __future__ import unicode_literals
 import asyncio
+import hashlib
+import random
+import time
 from unittest import mock
 
+from . import capture
 from . import manager
 from . import utils
 
@@ -14,20 +18,37 @@ call = mock.call
 class AMIProtocol(manager.AMIProtocol):
 
     debug_count = [0]
+    fixtures = {}
 
     def connection_made(self, transport):
         super(AMIProtocol, self).connection_made(transport)
         self.transport = MagicMock()
 
+    @classmethod
+    def load_fixture(cls, path):
+        """Return the chunks of a fixture. Raw AMI traces are split by
+        frames. Files are only loaded once"""
+        chunks = cls.fixtures.get(path)
+        if chunks is None:
+            stream = capture.Capture(path)
+            if stream.is_capture:
+                chunks = [data for direction, timestamp, data in stream
+                          if direction == 'in']
+            else:
+                chunks = [resp + b'\n\n'
+                          for resp in bytes(stream.data).split(b'\n\n')]
+            stream.close()
+            cls.fixtures[path] = chunks
+        return chunks
+
     def send(self, data, as_list=False):
         utils.IdGenerator.reset(uid='transaction_uid')
         future = super(AMIProtocol, self).send(data, as_list=as_list)
         if getattr(self.factory, 'stream', None) is not None:
-            with open(self.factory.stream, 'rb') as fd:
-                for resp in fd.read().split(b'\n\n'):
-                    self.data_received(resp + b'\n\n')
-                    if future.done():
-                        break
+            for resp in self.load_fixture(self.factory.stream):
+                self.data_received(resp)
+                if future.done():
+                    break
             if not future.done():  # pragma: no cover
                 print(self.responses)
                 raise AssertionError("Future's result was never set")
@@ -62,6 +83,272 @@ class Manager(manager.Manager):
         utils.EOL = '\n'
 
 
+class Replay:
+    """Replay the incoming data of a capture through an AMIProtocol.
+
+    - ``speed=None``: as fast as possible
+    - ``speed=1``: real time, using the timestamps of the capture
+    - ``speed=10``: ten times faster than real time
+
+    .. code-block:: python
+
+        manager = testing.Manager()
+        manager.register_event('Newchannel', on_new_channel)
+        stats = await testing.Replay('ami.cap', speed=None).run(
+            manager.protocol)
+        print(stats['bytes_per_second'])
+
+    Records are loaded once from a :class:`~panoramisk.capture.Capture` so
+    the same Replay can be run several times.
+    """
+
+    def __init__(self, path, speed=None, batch_size=100):
+        self.capture = capture.Capture(path)
+        self.speed = speed
+        self.batch_size = batch_size
+
+    async def run(self, protocol):
+        """Feed the capture to ``protocol.data_received``. Return some
+        throughput stats"""
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        first_timestamp = None
+        records = size = 0
+        for direction, timestamp, data in self.capture:
+            if direction != 'in':
+                continue
+            if self.speed and timestamp is not None:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = ((timestamp - first_timestamp) / self.speed -
+                         (loop.time() - started_at))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif records % self.batch_size == 0:
+                # let the loop run the handlers
+                await asyncio.sleep(0)
+            protocol.data_received(data)
+            records += 1
+            size += len(data)
+        await asyncio.sleep(0)
+        elapsed = loop.time() - started_at
+        return {
+            'records': records,
+            'bytes': size,
+            'elapsed': elapsed,
+            'records_per_second': records / elapsed if elapsed else 0.,
+            'bytes_per_second': size / elapsed if elapsed else 0.,
+        }
+
+    def close(self):
+        self.capture.close()
+
+
+class FakeAMIProtocol(asyncio.Protocol):
+    """Server side of a :class:`FakeAMIServer` connection"""
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = b''
+        self.transport = None
+        self.authenticated = False
+        self.events = True
+        self.challenge = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.clients.add(self)
+        transport.write(('Asterisk Call Manager/%s%s' % (
+            self.server.version, utils.EOL)).encode())
+
+    def connection_lost(self, exc):
+        self.server.clients.discard(self)
+
+    def data_received(self, data):
+        self.buffer += data.replace(b'\r\n', b'\n')
+        *frames, self.buffer = self.buffer.split(b'\n\n')
+        for frame in frames:
+            headers = utils.CaseInsensitiveDict(
+                line.split(': ', 1)
+                for line in frame.decode('utf8').strip().split('\n')
+                if ': ' in line)
+            if headers:
+                self.server.actions_received += 1
+                for message in self.server.handle_action(self, headers):
+                    self.write(message)
+
+    def write(self, message):
+        if self.transport is not None and not self.transport.is_closing():
+            lines = []
+            for k, v in message.items():
+                if isinstance(v, (list, tuple)):
+                    lines.extend('%s: %s' % (k, i) for i in v)
+                else:
+                    lines.append('%s: %s' % (k, v))
+            eol = utils.EOL
+            self.transport.write((eol.join(lines) + eol + eol).encode('utf8'))
+
+
+class FakeAMIServer:
+    """An asyncio AMI server to run a :class:`~panoramisk.Manager` against a
+    real socket without Asterisk.
+
+    It handles ``Login`` (plain or md5 with ``Challenge``), ``Ping`` and
+    ``Logoff``. ``event_lists`` maps action names to the list of events to
+    return. ``handlers`` maps action names to callables taking the server
+    and the action headers and returning a list of messages. They can
+    override ``Ping`` and ``Logoff``:
+
+    .. code-block:: python
+
+        server = testing.FakeAMIServer(event_lists={
+            'CoreShowChannels': [{'Event': 'CoreShowChannel',
+                                  'Channel': 'SIP/gawel-00000001'}],
+        })
+        await server.start()
+        manager = Manager(port=server.port,
+                          username='username', secret='secret')
+        await manager.connect()
+        await server.storm({'Event': 'Newexten'}, rate=1000, duration=10)
+        await server.close()
+
+    ``disconnect()`` closes all connections to test reconnections.
+    """
+
+    version = '5.0.1'
+
+    def __init__(self, host='127.0.0.1', port=0, username='username',
+                 secret='secret', event_lists=None, handlers=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.secret = secret
+        self.event_lists = {k.lower(): v
+                            for k, v in (event_lists or {}).items()}
+        self.handlers = {k.lower(): v for k, v in (handlers or {}).items()}
+        self.clients = set()
+        self.server = None
+        self.actions_received = 0
+        self.events_sent = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(
+            lambda: FakeAMIProtocol(self), self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    def disconnect(self):
+        """Close all client connections"""
+        for client in list(self.clients):
+            client.transport.close()
+
+    async def close(self):
+        self.disconnect()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def handle_action(self, client, action):
+        name = action.get('Action', '').lower()
+        response = {'Response': 'Success'}
+        if 'ActionID' in action:
+            response['ActionID'] = action['ActionID']
+        if name == 'challenge':
+            client.challenge = str(random.randint(10 ** 8, 10 ** 9 - 1))
+            response['Challenge'] = client.challenge
+            return [response]
+        elif name == 'login':
+            if action.get('AuthType', '').lower() == 'md5':
+                key = hashlib.md5(((client.challenge or '') + self.secret)
+                                  .encode('utf8')).hexdigest()
+                valid = action.get('Key') == key
+            else:
+                valid = action.get('Secret') == self.secret
+            if not valid or action.get('Username') != self.username:
+                response.update(Response='Error',
+                                Message='Authentication failed')
+                return [response]
+            client.authenticated = True
+            client.events = action.get('Events', 'on').lower() != 'off'
+            response['Message'] = 'Authentication accepted'
+            messages = [response]
+            if client.events:
+                messages.append({'Event': 'FullyBooted',
+                                 'Privilege': 'system,all',
+                                 'Status': 'Fully Booted'})
+            return messages
+        elif not client.authenticated:
+            response.update(Response='Error', Message='Permission denied')
+            return [response]
+        elif name in self.handlers:
+            return self.handlers[name](self, action)
+        elif name == 'ping':
+            response.update(Ping='Pong', Timestamp='%.6f' % time.time())
+            return [response]
+        elif name == 'logoff':
+            response.update(Response='Goodbye',
+                            Message='Thanks for all the fish.')
+            asyncio.get_running_loop().call_soon(client.transport.close)
+            return [response]
+        elif name in self.event_lists:
+            events = self.event_lists[name]
+            response.update(EventList='start',
+                            Message='Events will follow')
+            messages = [response]
+            for event in events:
+                event = dict(event)
+                if 'ActionID' in action:
+                    event['ActionID'] = action['ActionID']
+                messages.append(event)
+            complete = {'Event': action['Action'] + 'Complete',
+                        'EventList': 'Complete',
+                        'ListItems': str(len(events))}
+            if 'ActionID' in action:
+                complete['ActionID'] = action['ActionID']
+            messages.append(complete)
+            return messages
+        response.update(Response='Error',
+                        Message='Invalid/unknown command')
+        return [response]
+
+    def broadcast(self, event):
+        """Send an event to all clients which receive events"""
+        for client in self.clients:
+            if client.authenticated and client.events:
+                client.write(event)
+                self.events_sent += 1
+
+    async def storm(self, event, rate=1000, count=None, duration=None):
+        """Broadcast ``event`` at ``rate`` events per second, until ``count``
+        events are sent or for ``duration`` seconds. ``event`` can also be a
+        callable taking the event number and returning an event. A
+        ``Timestamp`` header is added if missing so clients can measure the
+        latency. Return the number of events sent."""
+        if count is None and duration is None:
+            raise ValueError('count or duration is required')
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        sent = 0
+        while True:
+            elapsed = loop.time() - started_at
+            if duration is not None and elapsed >= duration:
+                break
+            target = int(elapsed * rate) + 1
+            if count is not None:
+                target = min(target, count)
+            while sent < target:
+                message = event(sent) if callable(event) else dict(event)
+                message.setdefault('Timestamp', '%.6f' % time.time())
+                self.broadcast(message)
+                sent += 1
+            if count is not None and sent >= count:
+                break
+            await asyncio.sleep(max(.001, (sent / rate) - elapsed))
+        return sent
+
+
 class FakeAsteriskClient:
     def __init__(self, port: int , host: str = '127.0.0.1'):
         self.host = host
@@ -1,5 +1,9 @@
+import heapq
+import itertools
 import re
+import sys
 import uuid
+import weakref
 
 try:
     from collections.abc import MutableMapping
@@ -102,24 +106,37 @@ class IdGenerator:
         mycounter/an_uuid4/1/1
         >>> print(g())
         mycounter/an_uuid4/1/2
+
+    With ``compact=True``, ids only use the first 8 chars of the uuid and an
+    hexadecimal counter:
+
+    .. code-block:: python
+
+        >>> g = IdGenerator('c', compact=True)
+        >>> g.uid = 'an_uuid4'
+        >>> print(g())
+        c/an_uuid4/1
+
+    To use compact ids for all actions::
+
+        Action.action_id_generator = IdGenerator('a', compact=True)
+
+    IDs are taken from an ``itertools.count`` so a generator can be shared
+    by threads.
     """
 
-    instances = []
+    instances = weakref.WeakSet()
+    max_val = 10000
 
-    def __init__(self, prefix):
-        self.instances.append(self)
+    def __init__(self, prefix, compact=False):
+        self.instances.add(self)
         self.prefix = prefix
+        self.compact = compact
         self.uid = str(uuid.uuid4())
-        self.generator = self.get_generator()
-
-    def get_generator(self):
-        i = 0
-        max_val = 10000
-        while True:
-            yield "%s/%s/%d/%d" % (self.prefix,
-                                   self.uid, (i // max_val) + 1,
-                                   (i % max_val) + 1)
-            i += 1
+        if compact:
+            self.uid = self.uid[:8]
+        self.counter = itertools.count(1)
+        self.block = (None, None)
 
     @classmethod
     def reset(cls, uid=None):
@@ -128,75 +145,238 @@ class IdGenerator:
         for instance in cls.instances:
             if uid:
                 instance.uid = uid
-            instance.generator = instance.get_generator()
+            instance.counter = itertools.count(1)
+            instance.block = (None, None)
 
     def get_instances(self):
         """Mostly used for debugging"""
         return ["<%s prefix:%s (uid:%s)>" % (self.__class__.__name__,
-                                             i.prefix, self.uid)
+                                             i.prefix, i.uid)
                 for i in self.instances]
 
     def __call__(self):
-        return next(self.generator)
+        i = next(self.counter)
+        if self.compact:
+            return '%s/%s/%x' % (self.prefix, self.uid, i)
+        number, n = divmod(i - 1, self.max_val)
+        block = self.block
+        if block[0] != number:
+            # read and replace as a whole, other threads may use it
+            block = self.block = (number, '%s/%s/%d/' % (
+                self.prefix, self.uid, number + 1))
+        return block[1] + str(n + 1)
 
     def __repr__(self):
         return "<%s prefix:%s (uid:%s)>" % (self.__class__.__name__, self.prefix, self.uid)
 
 
-class CaseInsensitiveDict(MutableMapping):
-    """
-    A case-insensitive ``dict``-like object.
+class TimerWheel:
+    """Expire items with a single timer. Deadlines are rounded up to
+    ``resolution`` seconds and items sharing a tick are stored in the same
+    slot:
 
-    Implements all methods and operations of ``collections.MutableMapping``.
-
-    All keys are expected to be strings. The structure remembers the
-    case of the last key to be set, and ``iter(instance)``,
-    ``keys()``, ``items()``, ``iterkeys()``, and ``iteritems()``
-    will contain case-sensitive keys. However, querying and contains
-    testing is case insensitive:
+    ..
+        >>> import asyncio
+        >>> loop = asyncio.new_event_loop()
 
     .. code-block:: python
 
-        cid = CaseInsensitiveDict()
-        cid['Action'] = 'SIPnotify'
-        cid['aCTION'] == 'SIPnotify'  # True
-        list(cid) == ['Action']  # True
+        >>> expired = []
+        >>> wheel = TimerWheel(loop, expired.append, resolution=.01)
+        >>> wheel.add('first', 0.01)
+        >>> wheel.add('second', 10)
+        >>> len(wheel)
+        2
+        >>> wheel.discard('second')
+        >>> loop.run_until_complete(asyncio.sleep(.05))
+        >>> expired
+        ['first']
 
-    For example, ``event['actionid']`` will return the
-    value of a ``'ActionID'`` response event, regardless
-    of how the event name was originally stored.
+    ..
+        >>> loop.close()
     """
-    def __init__(self, data=None, **kwargs):
-        self._store = dict()
-        self.update(data or {}, **kwargs)
+
+    def __init__(self, loop, callback, resolution=.1):
+        self.loop = loop
+        self.callback = callback
+        self.resolution = resolution
+        self.slots = {}
+        self.ticks = []
+        self.items = {}
+        self.timer = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item, delay):
+        """Call ``callback(item)`` in ``delay`` seconds"""
+        self.discard(item)
+        tick = -int(-(self.loop.time() + delay) // self.resolution)
+        slot = self.slots.get(tick)
+        if slot is None:
+            slot = self.slots[tick] = {}
+            heapq.heappush(self.ticks, tick)
+            if self.ticks[0] == tick:
+                self.schedule()
+        slot[id(item)] = item
+        self.items[id(item)] = tick
+
+    def discard(self, item):
+        """Forget an item"""
+        tick = self.items.pop(id(item), None)
+        if tick is not None:
+            del self.slots[tick][id(item)]
+
+    def schedule(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.loop.call_at(self.ticks[0] * self.resolution,
+                                       self.expire)
+
+    def expire(self):
+        self.timer = None
+        now = self.loop.time()
+        ticks = self.ticks
+        while ticks and ticks[0] * self.resolution <= now:
+            slot = self.slots.pop(heapq.heappop(ticks))
+            for key, item in slot.items():
+                del self.items[key]
+                self.callback(item)
+        if ticks:
+            self.schedule()
+
+    def close(self):
+        """Forget all items"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.slots.clear()
+        self.ticks.clear()
+        self.items.clear()
+
+
+#: Common AMI headers. Their lower case names are computed and interned once
+HEADERS = (
+    'Action', 'ActionID', 'CommandID', 'Response', 'Message', 'Event',
+    'EventList', 'ListItems', 'SubEvent', 'Privilege', 'Timestamp',
+    'SystemName', 'Channel', 'ChannelState', 'ChannelStateDesc',
+    'CallerIDNum', 'CallerIDName', 'ConnectedLineNum', 'ConnectedLineName',
+    'Language', 'AccountCode', 'Context', 'Exten', 'Priority', 'Uniqueid',
+    'Linkedid', 'Uniqueid1', 'Uniqueid2', 'Channel1', 'Channel2',
+    'DestChannel', 'DestUniqueid', 'DestLinkedid', 'DialStatus',
+    'BridgeUniqueid', 'BridgeType', 'Application', 'AppData', 'Variable',
+    'Value', 'Status', 'Cause', 'Cause-txt', 'Peer', 'PeerStatus',
+    'ObjectName', 'Queue', 'Interface', 'Result', 'Ping', 'Username',
+    'Secret', 'Events', 'Command', 'content',
+)
+
+canonical_keys = {}  # lower case name -> header name
+lowered_keys = {}  # header name or lower case name -> lower case name
+for name in HEADERS:
+    lower = sys.intern(name.lower())
+    canonical_keys[lower] = name
+    lowered_keys[name] = lowered_keys[lower] = lower
+del name, lower
+
+
+class BaseCaseInsensitiveDict(MutableMapping):
+    """Methods of :class:`CaseInsensitiveDict`. Values are stored by lower
+    case keys in ``_values``. ``_keys`` only stores the original keys which
+    are not a known header name. Subclasses must provide the ``_values``
+    and ``_keys`` attributes"""
+
+    __slots__ = ()
 
     def __setitem__(self, key, value):
-        # Use the lowercased key for lookups, but store the actual
-        # key alongside the value.
-        self._store[key.lower()] = (key, value)
+        lkey = lowered_keys.get(key)
+        if lkey is None:
+            lkey = key.lower()
+        self._values[lkey] = value
+        keys = self._keys
+        if canonical_keys.get(lkey) != key:
+            # remember the case of the key
+            if keys is None:
+                keys = self._keys = {}
+            keys[lkey] = key
+        elif keys is not None:
+            keys.pop(lkey, None)
 
     def __contains__(self, key):
-        return key.lower() in self._store
+        lkey = lowered_keys.get(key)
+        return (key.lower() if lkey is None else lkey) in self._values
 
     def __getattr__(self, attr):
         return self.get(attr, '')
 
     def __getitem__(self, key):
-        return self._store[key.lower()][1]
+        lkey = lowered_keys.get(key)
+        return self._values[key.lower() if lkey is None else lkey]
 
     def __delitem__(self, key):
         raise NotImplementedError()
 
     def __iter__(self):
-        return (key for key, value in self._store.values())
+        keys = self._keys
+        if keys is None:
+            return (canonical_keys[lkey] for lkey in self._values)
+        return (keys[lkey] if lkey in keys else canonical_keys[lkey]
+                for lkey in self._values)
 
     def __len__(self):
-        return len(self._store)
+        return len(self._values)
 
     def __repr__(self):
         return str(dict(self.items()))
 
 
+class CaseInsensitiveDict(BaseCaseInsensitiveDict):
+    """
+    A case-insensitive ``dict``-like object.
+
+    Implements all methods and operations of ``collections.MutableMapping``.
+
+    All keys are expected to be strings. The structure remembers the
+    case of the last key to be set, and ``iter(instance)``,
+    ``keys()``, ``items()``, ``iterkeys()``, and ``iteritems()``
+    will contain case-sensitive keys. However, querying and contains
+    testing is case insensitive:
+
+    .. code-block:: python
+
+        cid = CaseInsensitiveDict()
+        cid['Action'] = 'SIPnotify'
+        cid['aCTION'] == 'SIPnotify'  # True
+        list(cid) == ['Action']  # True
+
+    For example, ``event['actionid']`` will return the
+    value of a ``'ActionID'`` response event, regardless
+    of how the event name was originally stored.
+    """
+
+    __slots__ = ('_values', '_keys')
+
+    def __init__(self, data=None, **kwargs):
+        self._values = values = {}
+        self._keys = keys = None
+        if isinstance(data, dict):
+            # fast path for parsed messages
+            for key, value in data.items():
+                lkey = lowered_keys.get(key)
+                if lkey is None:
+                    lkey = key.lower()
+                values[lkey] = value
+                if canonical_keys.get(lkey) != key:
+                    if keys is None:
+                        keys = self._keys = {}
+                    keys[lkey] = key
+                elif keys is not None:
+                    keys.pop(lkey, None)
+        elif data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+
 def config(filename_or_fd, section='asterisk'):
     config = ConfigParser()
     if hasattr(filename_or_fd, 'read'):
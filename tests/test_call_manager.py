@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from panoramisk import utils
+from panoramisk.call_manager import Call
+from panoramisk.call_manager import CallManager
+from panoramisk.message import Message
+
+
+def event(uniqueid, **headers):
+    return Message(dict(headers, Event='Newstate', Uniqueid=uniqueid))
+
+
+@pytest.fixture
+def manager():
+    def manager(**config):
+        config['loop'] = asyncio.get_event_loop()
+        return CallManager(**config)
+    return manager
+
+
+def test_handle_calls(manager):
+    manager = manager()
+    manager.dispatch(event('1437920906.1'))
+    manager.dispatch(event('1437920906.2'))
+    call = manager.calls_queues['1437920906']
+    assert call.queue.qsize() == 2
+
+
+@pytest.mark.parametrize('overflow,expected', [
+    ('drop_oldest', ['3', '4']),
+    ('drop_newest', ['1', '2']),
+])
+def test_call_queue_overflow(manager, overflow, expected):
+    manager = manager(call_queue_size=2, call_queue_overflow=overflow)
+    for i in '1234':
+        manager.dispatch(event('42.0', Step=i))
+    call = manager.calls_queues['42']
+    assert [call.queue.get_nowait().step for i in '12'] == expected
+    assert call.dropped == 2
+    assert manager.dropped_events == 2
+
+
+def test_call_class(manager):
+    class MyCall(Call):
+        def __init__(self, uniqueid):
+            super(MyCall, self).__init__(uniqueid)
+            self.mine = True
+
+    manager = manager(CallClass=MyCall)
+    manager.dispatch(event('42.0'))
+    call = manager.calls_queues['42']
+    assert call.mine
+    assert call.queue.qsize() == 1
+
+
+def test_call_queue_invalid_overflow(manager):
+    with pytest.raises(ValueError):
+        manager(call_queue_overflow='block')
+
+
+def test_max_calls(manager):
+    manager = manager(max_calls=2)
+    for uniqueid in ('1.0', '2.0', '1.1', '3.0'):
+        manager.dispatch(event(uniqueid))
+    assert list(manager.calls_queues) == ['1', '3']
+    assert manager.evicted_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_call_ttl(manager):
+    manager = manager(call_ttl=.05)
+    manager.dispatch(event('1.0'))
+    await asyncio.sleep(.03)
+    manager.dispatch(event('2.0'))
+    await asyncio.sleep(.03)
+    assert list(manager.calls_queues) == ['2']
+    assert manager.expired_calls == 1
+    await asyncio.sleep(.05)
+    assert list(manager.calls_queues) == []
+    assert manager.expired_calls == 2
+    assert manager.calls_activity == {}
+
+
+@pytest.mark.asyncio
+async def test_call_ttl_call_class(manager):
+    class OldCall:
+        def __init__(self, uniqueid):
+            self.uniqueid = uniqueid
+            self.events = []
+
+        def append(self, *events):
+            self.events.extend(events)
+
+    manager = manager(CallClass=OldCall, call_ttl=.02)
+    manager.dispatch(event('1.0'))
+    assert manager.calls_queues['1'].events
+    await asyncio.sleep(.05)
+    assert list(manager.calls_queues) == []
+    assert manager.expired_calls == 1
+    assert manager.expire_handle is None
+    manager.close()
+
+
+def test_originated_calls_only(manager):
+    manager = manager(originated_calls_only=True)
+    future = manager.loop.create_future()
+    response = manager.loop.create_future()
+    response.set_result(Message({'Event': 'OriginateResponse',
+                                 'ActionID': '42',
+                                 'Uniqueid': '1437920906.1'}))
+    manager.dispatch(event('1437920906.1'))
+    assert manager.calls_queues == {}
+    manager.set_result(future, response)
+    call = future.result()
+    assert manager.calls_queues == {'1437920906': call}
+    manager.dispatch(event('1437920906.1'))
+    manager.dispatch(event('1437920907.2', Linkedid='1437920906.1'))
+    manager.dispatch(event('1437920908.3', Linkedid='1437920908.3'))
+    assert list(manager.calls_queues) == ['1437920906']
+    assert call.queue.qsize() == 2
+
+
+def test_call_message():
+    from panoramisk.call_manager import CallMessage
+    msg = CallMessage.from_line(utils.EOL.join([
+        'Event: Newstate', 'Uniqueid: 1.0', 'Linkedid: 2.0', 'Channel: X']))
+    assert msg.uniqueid == '1.0'
+    assert msg.linkedid == '2.0'
+    assert msg.uniqueid1 == ''
+    assert msg.parsed is False
@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import io
+import pytest
+from unittest import mock
+from panoramisk import capture
+from panoramisk import testing
+
+
+def test_stream_recorder(tmpdir):
+    path = str(tmpdir.join('ami.cap'))
+    recorder = capture.StreamRecorder(path)
+    recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+    recorder.record('out', b'Action: Ping\r\n\r\n')
+    recorder.close()
+    with open(path, 'rb') as fd:
+        lines = fd.read().split(b'\n')
+    assert lines[0] == b'PANORAMISK-CAPTURE 1'
+    assert lines[1].startswith(b'in ')
+    assert lines[1].endswith(b' 21')
+    assert lines[2:4] == [b'Event: PeerStatus\r', b'\r']
+    assert lines[5].startswith(b'out ')
+
+
+def test_stream_recorder_rotate(tmpdir):
+    path = str(tmpdir.join('ami.cap.gz'))
+    recorder = capture.StreamRecorder(path, max_bytes=100, backup_count=2)
+    for i in range(10):
+        recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+    recorder.close()
+    assert sorted(f.basename for f in tmpdir.listdir()) == [
+        'ami.cap.gz', 'ami.cap.gz.1', 'ami.cap.gz.2']
+    with gzip.open(path) as fd:
+        assert fd.read().startswith(capture.StreamRecorder.magic)
+
+
+def test_stream_recorder_restart(tmpdir):
+    path = str(tmpdir.join('ami.cap'))
+    for i in range(3):
+        recorder = capture.StreamRecorder(path, max_bytes=100)
+        recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+        recorder.close()
+    # the second run appended to the file. The third one rotated it
+    assert sorted(f.basename for f in tmpdir.listdir()) == [
+        'ami.cap', 'ami.cap.1']
+    assert tmpdir.join('ami.cap').size() < 100 < tmpdir.join(
+        'ami.cap.1').size()
+
+
+def test_stream_recorder_error(tmpdir, caplog):
+    fd = mock.Mock()
+    fd.write.side_effect = [None, None, None, OSError('disk full')]
+
+    class Recorder(capture.StreamRecorder):
+        def open(self):
+            return fd
+
+    recorder = Recorder(str(tmpdir.join('ami.cap')), flush_interval=60)
+    recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+    recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+    recorder.close()
+    fd.close.assert_called_once_with()
+    assert 'Records dropped: 1' in caplog.text
+
+
+def test_raw_stream():
+    fd = io.StringIO()
+    recorder = capture.recorder(fd)
+    recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+    recorder.record('out', b'Action: Ping\r\n\r\n')
+    assert fd.getvalue() == 'Event: PeerStatus\r\n\r\n'
+
+
+def write_capture(path, records):
+    with open(path, 'wb') as fd:
+        fd.write(capture.StreamRecorder.magic)
+        for direction, timestamp, data in records:
+            fd.write(b'%s %.6f %d\n' % (direction, timestamp, len(data)))
+            fd.write(data + b'\n')
+
+
+def test_capture(tmpdir):
+    path = str(tmpdir.join('ami.cap'))
+    recorder = capture.StreamRecorder(path)
+    recorder.record('in', b'Event: PeerStatus\r\n\r\n')
+    recorder.record('out', b'Action: Ping\r\n\r\n')
+    recorder.close()
+    stream = capture.Capture(path)
+    assert stream.is_capture
+    assert [(d, data) for d, ts, data in stream] == [
+        ('in', b'Event: PeerStatus\r\n\r\n'),
+        ('out', b'Action: Ping\r\n\r\n')]
+    stream.close()
+
+
+def test_capture_raw(tmpdir):
+    path = tmpdir.join('ami.txt')
+    path.write(b'Event: PeerStatus\r\n\r\n', mode='wb')
+    stream = capture.Capture(str(path))
+    assert not stream.is_capture
+    assert list(stream) == [('in', None, b'Event: PeerStatus\r\n\r\n')]
+
+
+@pytest.mark.parametrize('speed', [None, 10])
+@pytest.mark.asyncio
+async def test_replay(tmpdir, speed):
+    path = str(tmpdir.join('ami.cap'))
+    write_capture(path, [
+        (b'in', 10., b'Event: PeerStatus\nPeer: 1\n\nEvent: Peer'),
+        (b'out', 10.1, b'Action: Ping\n\n'),
+        (b'in', 10.2, b'Status\nPeer: 2\n\nEvent: Newexten\n\n'),
+        (b'in', 10.3, b'Event: PeerStatus\nPeer: 3\n\n'),
+    ])
+    manager = testing.Manager(loop=asyncio.get_running_loop())
+    peers = []
+    manager.register_event('Peer*', lambda m, e: peers.append(e.peer))
+    replay = testing.Replay(path, speed=speed)
+    stats = await replay.run(manager.protocol)
+    replay.close()
+    assert peers == ['1', '2', '3']
+    assert manager.skipped_frames == 1
+    assert stats['records'] == 3
+    if speed:
+        assert stats['elapsed'] >= .03
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from panoramisk import testing
+from panoramisk.cluster import ManagerCluster
+
+
+@pytest.mark.asyncio
+async def test_cluster():
+    servers = [testing.FakeAMIServer(),
+               testing.FakeAMIServer(handlers={'Ping': lambda s, a: []})]
+    for server in servers:
+        await server.start()
+    cluster = ManagerCluster(
+        {'pbx%d' % i: {'port': server.port}
+         for i, server in enumerate(servers)},
+        loop=asyncio.get_running_loop(),
+        username='username', secret='secret', ping_delay=60)
+    events = []
+
+    @cluster.register_event('Newexten')
+    def callback(manager, event):
+        events.append((manager.name, event.node))
+
+    await cluster.connect()
+    for i in range(100):
+        if all(m.authenticated for m in cluster):
+            break
+        await asyncio.sleep(.01)
+    assert len(cluster) == 2
+    assert cluster['pbx0'].patterns_table is cluster['pbx1'].patterns_table
+
+    for server in servers:
+        server.broadcast({'Event': 'Newexten'})
+    for i in range(100):
+        if len(events) == 2:
+            break
+        await asyncio.sleep(.01)
+    assert sorted(events) == [('pbx0', 'pbx0'), ('pbx1', 'pbx1')]
+
+    results = await cluster.send_action_all({'Action': 'Ping'}, timeout=.1)
+    assert list(results) == ['pbx0', 'pbx1']
+    assert results['pbx0'].ping == 'Pong'
+    assert isinstance(results['pbx1'], asyncio.TimeoutError)
+    assert cluster['pbx1'].protocol.outstanding == 0
+
+    resp = await cluster.send_action('pbx0', {'Action': 'Ping'})
+    assert resp.ping == 'Pong'
+
+    cluster.close()
+    for server in servers:
+        await server.close()
+
+
+def test_cluster_save_stream(tmpdir):
+    path = str(tmpdir.join('ami.cap.gz'))
+    cluster = ManagerCluster(
+        {'pbx1': {}, 'pbx2': {'save_stream': path}},
+        save_stream=path)
+    assert cluster['pbx1'].recorder.path == str(
+        tmpdir.join('ami.cap.pbx1.gz'))
+    assert cluster['pbx1'].recorder.compress
+    assert cluster['pbx2'].recorder.path == path
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from panoramisk import Manager
+from panoramisk import actions
+from panoramisk import testing
+
+
+async def connect(server, **config):
+    manager = Manager(loop=asyncio.get_running_loop(), port=server.port,
+                      username='username', secret='secret',
+                      ping_delay=60, **config)
+    await manager.connect()
+    for i in range(100):
+        if manager.authenticated:
+            break
+        await asyncio.sleep(.01)
+    return manager
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('auth_type', [None, 'md5'])
+async def test_login(auth_type):
+    server = testing.FakeAMIServer()
+    await server.start()
+    manager = await connect(server, auth_type=auth_type)
+    assert manager.authenticated
+    assert manager.protocol.version == '5.0.1'
+    resp = await manager.send_action({'Action': 'Ping'})
+    assert resp.ping == 'Pong'
+    resp = await manager.send_action({'Action': 'Unknown'})
+    assert resp.response == 'Error'
+    manager.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_bad_login():
+    server = testing.FakeAMIServer(secret='other')
+    await server.start()
+    manager = await connect(server)
+    assert not manager.authenticated
+    resp = await manager.send_action({'Action': 'Ping'})
+    assert resp.message == 'Permission denied'
+    manager.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_event_list():
+    server = testing.FakeAMIServer(event_lists={
+        'CoreShowChannels': [
+            {'Event': 'CoreShowChannel', 'Channel': 'SIP/%d' % i}
+            for i in range(3)],
+    })
+    await server.start()
+    manager = await connect(server)
+    resp = await manager.send_action({'Action': 'CoreShowChannels'})
+    assert [e.channel for e in resp[1:-1]] == ['SIP/0', 'SIP/1', 'SIP/2']
+    assert resp[-1].eventlist == 'Complete'
+    manager.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_storm():
+    server = testing.FakeAMIServer()
+    await server.start()
+    manager = await connect(server)
+    events = []
+    manager.register_event('Newexten', lambda m, e: events.append(e))
+    sent = await server.storm({'Event': 'Newexten'}, rate=2000, count=200)
+    assert sent == 200
+    for i in range(100):
+        if len(events) == 200:
+            break
+        await asyncio.sleep(.01)
+    assert len(events) == 200
+    assert events[0].timestamp
+    manager.close()
+    await server.close()
+    with pytest.raises(ValueError):
+        await server.storm({'Event': 'Newexten'})
+
+
+@pytest.mark.asyncio
+async def test_reconnect():
+    server = testing.FakeAMIServer()
+    await server.start()
+    manager = await connect(server, reconnect_timeout=.01)
+    protocol = manager.protocol
+    server.disconnect()
+    for i in range(100):
+        if manager.protocol is not protocol and manager.authenticated:
+            break
+        await asyncio.sleep(.01)
+    assert manager.protocol is not protocol
+    assert manager.authenticated
+    manager.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_window_with_awaited_actions():
+    server = testing.FakeAMIServer(event_lists={
+        'Status': [{'Event': 'Status', 'Channel': 'SIP/%d' % i}
+                   for i in range(200)]})
+    await server.start()
+    manager = await connect(server)
+    action = actions.Action({'Action': 'Status'}, window=10)
+    channels = []
+
+    async def iterate():
+        async for event in manager.send_action(action):
+            if event.event == 'Status':
+                channels.append(event.channel)
+                resp = await manager.send_action({'Action': 'Ping'})
+                assert resp.ping == 'Pong'
+
+    await asyncio.wait_for(iterate(), 5)
+    assert len(channels) == 200
+    assert manager.protocol.reading_paused_by is None
+    manager.close()
+    await server.close()
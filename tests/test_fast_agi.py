@@ -119,3 +119,72 @@ async def test_fast_agi_application_error( unused_tcp_port):
     server.close()
     await server.wait_closed()
     await asyncio.sleep(1)  # Wait the end of endpoint
+
+
+@pytest.mark.asyncio
+async def test_fast_agi_pipeline(unused_tcp_port):
+    results = asyncio.get_running_loop().create_future()
+
+    async def pipelined(request):
+        results.set_result(await request.pipeline([
+            'ANSWER', 'SET VARIABLE x "1"', 'EXEC Dial something']))
+
+    fa_app = Application()
+    fa_app.add_route('call_waiting', pipelined)
+    server = await asyncio.start_server(fa_app.handler, '127.0.0.1',
+                                        unused_tcp_port)
+
+    reader, writer = await asyncio.open_connection(
+        '127.0.0.1', unused_tcp_port)
+    writer.write(FAST_AGI_PAYLOAD)
+    commands = [await reader.readline() for i in range(3)]
+    assert commands == [b'ANSWER\n', b'SET VARIABLE x "1"\n',
+                        b'EXEC Dial something\n']
+    writer.write(b'100 Trying...\n200 result=0\n200 result=1\n'
+                 b'200 result=-1\n')
+    assert await results == [
+        {'msg': '', 'result': ('0', ''), 'status_code': 200},
+        {'msg': '', 'result': ('1', ''), 'status_code': 200},
+        {'msg': 'Error executing application, or hangup',
+         'result': ('-1', ''), 'status_code': 200, 'error': 'AGIAppError'},
+    ]
+    writer.close()
+
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_fast_agi_headers(unused_tcp_port):
+    fa_app = Application(header_timeout=.1, max_header_size=100)
+    fa_app.add_route('call_waiting', call_waiting)
+    server = await asyncio.start_server(fa_app.handler, '127.0.0.1',
+                                        unused_tcp_port)
+
+    # headers too large
+    reader, writer = await asyncio.open_connection(
+        '127.0.0.1', unused_tcp_port)
+    writer.write(FAST_AGI_PAYLOAD)
+    assert await reader.read() == b''
+    writer.close()
+
+    # headers never completed
+    reader, writer = await asyncio.open_connection(
+        '127.0.0.1', unused_tcp_port)
+    writer.write(b'agi_network: yes\n')
+    assert await asyncio.wait_for(reader.read(), 1) == b''
+    writer.close()
+
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_fast_agi_read_headers():
+    reader = asyncio.StreamReader()
+    for i in range(0, len(FAST_AGI_PAYLOAD), 10):
+        reader.feed_data(FAST_AGI_PAYLOAD[i:i + 10])
+    headers = await Application().read_headers(reader)
+    assert headers['agi_network_script'] == 'call_waiting'
+    assert headers['agi_arg_1'] == 'answered'
+    assert len(headers) == 23
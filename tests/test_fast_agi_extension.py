@@ -183,3 +183,31 @@ async def test_agi_router_with_args(unused_tcp_port):
     await app.server.wait_closed()
     await asyncio.sleep(1)  # Wait the end of endpoint
 
+
+
+def test_route_binding():
+    from panoramisk.fastagi_extension import RouteBinding
+
+    async def route(request: Request, event: CallEvent, number: int,
+                    tags: list, x: int = 3, y=None):
+        pass
+
+    binding = RouteBinding(route)
+    headers = dict(
+        line.split(': ', 1)
+        for line in generate_agi_payload(
+            'call/event', args=['101', '98', 'sales', '120'],
+            kwargs={'number': '42', 'tags': 'a'}).decode().split('\n')
+        if ': ' in line)
+    request = Request(None, headers, None, None)
+    arguments = binding.bind(request)
+    assert arguments['request'] is request
+    assert arguments['event'] == CallEvent(101, '98', 'sales', 120)
+    assert arguments['number'] == 42
+    assert arguments['tags'] == ['a']
+    assert arguments['x'] == 3
+    assert arguments['y'] is None
+
+    request.query_params['unknown'] = ['1']
+    with pytest.raises(TypeError):
+        binding.bind(request)
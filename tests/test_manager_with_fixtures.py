@@ -162,6 +162,26 @@ def test_coroutine_events_handler(manager):
     assert matches == ['Peer*']
 
 
+def test_dispatch_table(manager):
+    import fnmatch
+    manager = manager()
+    patterns = ['Peer*', 'PeerStatus', '*Status', 'P?er*', 'Meetme[EJ]*',
+                'Meetme*', '*', 'Peer*', 'PeerStatus']
+    called = []
+    for pattern in patterns:
+        manager.register_event(
+            pattern, lambda m, e, p=pattern: called.append(p))
+    registered = list(dict.fromkeys(['FullyBooted'] + patterns))
+    for name in ('PeerStatus', 'Peer', 'MeetmeEnd', 'MeetmeTalking',
+                 'QueueStatus', ''):
+        del called[:]
+        expected = [p for p in registered if fnmatch.fnmatchcase(name, p)]
+        event = message.Message({'Event': name})
+        assert manager.dispatch(event) == expected
+        assert called == [p for p in expected for c in patterns if c == p]
+        assert manager.has_callbacks(name)
+
+
 def test_from_config( tmpdir):
     event_loop = asyncio.get_event_loop()    
     f = tmpdir.mkdir("config").join("config.ini")
@@ -1,3 +1,5 @@
+from panoramisk.call_manager import CallMessage
+from panoramisk.message import LazyMessage
 from panoramisk.message import Message
 from panoramisk import utils
 import pytest
@@ -50,3 +52,67 @@ def test_getdict(msg):
     for k, v in msg.getdict('chanvariable').items():
         assert isinstance(k, str)
         assert isinstance(v, str)
+
+
+@pytest.mark.parametrize('line', [
+    'Event: X\nChannel: SIP/gawel\nActionID: 42',
+    'Response: Success\nActionID: 42\nMessage: Pong',
+    'Response: Follows\nPrivilege: Command\nEvent: fake\n--END COMMAND--',
+    'Event: X\nValue: X\nValue: Y',
+    'Event: X\nEvent: Y',
+    'Event: AsyncAGIExec\nResult: 200%20result%3D1%20(SIP%2F000000)%0A',
+    'Channel: SIP/gawel',
+])
+def test_lazy_message(line):
+    EOL = utils.EOL
+    utils.EOL = '\n'
+    try:
+        expected = Message.from_line(line)
+        lazy = LazyMessage.from_line(line)
+        if expected is None:
+            assert lazy is None
+            return
+        assert isinstance(lazy, Message)
+        assert lazy.id == expected.id
+        assert lazy.action_id == expected.action_id
+        assert lazy.event == expected.event
+        assert lazy.success == expected.success
+        assert ('event' in lazy) == ('event' in expected)
+        assert dict(lazy.items()) == dict(expected.items())
+        assert repr(lazy) == repr(expected)
+    finally:
+        utils.EOL = EOL
+
+
+def test_lazy_message_parse_on_access(message):
+    m = LazyMessage.from_line('Event: Newchannel\nActionID: 42\nChannel: X')
+    assert m.event == 'Newchannel'
+    assert m.action_id == '42'
+    assert 'response' not in m
+    assert m.parsed is False
+    assert m.channel == 'X'
+    assert m.parsed is True
+    m['Channel'] = 'Y'
+    assert m['channel'] == 'Y'
+
+
+def test_lazy_message_headers(message):
+    m = LazyMessage.from_line('Event: Newchannel\nChannel: X')
+    assert m.line is not None
+    assert m.channel == 'X'
+    assert m.line is None
+    m = LazyMessage({'Event': 'Newchannel', 'Channel': 'X'})
+    assert m.parsed is True
+    assert m.line is None
+    assert m.channel == 'X'
+    assert LazyMessage({'Response': 'Follows'}, 'body').content == 'body'
+
+
+def test_lazy_message_case(message):
+    line = 'Event: AGIExec\nSubEvent: Start\nCommandId: 2095882815'
+    m = LazyMessage.from_line(line)
+    assert 'CommandID' in m
+    assert m.id == '2095882815'
+    assert m.subevent == 'Start'
+    m = CallMessage.from_line('Event: Newstate\nUniqueId: 42.1')
+    assert m.uniqueid == '42.1'
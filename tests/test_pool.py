@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from panoramisk import testing
+from panoramisk.pool import ManagerPool
+
+
+async def connect(server, **config):
+    pool = ManagerPool(loop=asyncio.get_running_loop(), port=server.port,
+                       username='username', secret='secret',
+                       ping_delay=60, reconnect_timeout=.01, **config)
+    await pool.connect()
+    for i in range(100):
+        if all(pool.is_healthy(m) for m in pool.members):
+            break
+        await asyncio.sleep(.01)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_pool():
+    server = testing.FakeAMIServer(handlers={
+        'Slow': lambda server, action: [],
+        'DBGet': lambda server, action: [{
+            'Response': 'Success', 'ActionID': action['ActionID'],
+            'Val': action['Key']}],
+    })
+    await server.start()
+    pool = await connect(server, pool_size=3)
+    assert [c.events for c in server.clients].count(True) == 1
+    events_manager, first, second = pool.members
+
+    slow = pool.send_action({'Action': 'Slow'})
+    busy = [m for m in pool.action_managers if m.protocol.outstanding]
+    assert len(busy) == 1
+    for i in range(4):
+        assert pool.select() is not busy[0]
+    resp = await pool.send_action({'Action': 'DBGet', 'Key': 'x'})
+    assert resp.val == 'x'
+    assert events_manager.protocol.outstanding == 0
+
+    events = []
+    pool.register_event('Newexten', lambda m, e: events.append(e))
+    await server.storm({'Event': 'Newexten'}, rate=1000, count=10)
+    for i in range(100):
+        if len(events) == 10:
+            break
+        await asyncio.sleep(.01)
+    assert len(events) == 10
+
+    # the slow action is sent again once the session is back
+    protocol = busy[0].protocol
+    pool.check_ping(busy[0], protocol, asyncio.Future())
+    assert pool.failed_health_checks == 1
+    assert not pool.is_healthy(busy[0])
+    assert pool.select() is not busy[0]
+    for i in range(100):
+        if pool.is_healthy(busy[0]):
+            break
+        await asyncio.sleep(.01)
+    assert busy[0].protocol is not protocol
+    await asyncio.sleep(.05)
+    assert busy[0].protocol.outstanding == 1
+    assert not slow.done()
+
+    pool.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_event_actions():
+    def originate(server, action):
+        asyncio.get_running_loop().call_soon(server.broadcast, {
+            'Event': 'OriginateResponse', 'ActionID': action['ActionID'],
+            'Response': 'Success', 'Uniqueid': '42.1'})
+        return [{'Response': 'Success', 'ActionID': action['ActionID'],
+                 'Message': 'Originate successfully queued'}]
+
+    server = testing.FakeAMIServer(handlers={'Originate': originate})
+    await server.start()
+    pool = await connect(server, pool_size=3)
+    resp = await asyncio.wait_for(pool.send_action(
+        {'Action': 'Originate', 'Channel': 'SIP/x'}, Async='true'), 1)
+    assert resp[-1].event == 'OriginateResponse'
+    assert pool.needs_events({'action': 'AGI'})
+    assert not pool.needs_events({'Action': 'Originate', 'Async': 'false'})
+    pool.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_fallback():
+    server = testing.FakeAMIServer()
+    await server.start()
+    pool = await connect(server, pool_size=1)
+    assert pool.select() is pool.events_manager
+    resp = await pool.send_action({'Action': 'Ping'})
+    assert resp.ping == 'Pong'
+    pool.close()
+    await server.close()
+    with pytest.raises(ValueError):
+        ManagerPool(pool_size=0)
@@ -1,5 +1,10 @@
+from panoramisk import actions
 from panoramisk import testing
+from panoramisk.message import LazyMessage
+from panoramisk.message import Message
+from panoramisk.exceptions import ActionTimeoutError
 import asyncio
+from unittest import mock
 import pytest
 
 
@@ -23,3 +28,289 @@ def test_received(conn):
 
 def test_send(conn):
     assert isinstance(conn.send({}), asyncio.Future)
+
+
+def test_received_fragmented(conn):
+    messages = []
+    conn.handle_message = messages.append
+    data = (b'Event: PeerStatus\nPeer: gawel\n\n'
+            b'Response: Follows\nPeer: gawel\n\n'
+            b'Event: PeerEntry\nValue: \xc3\xa9t\xc3\xa9\n\n')
+    for i in range(len(data)):
+        conn.data_received(data[i:i + 1])
+    fragmented = list(messages)
+    del messages[:]
+    conn.data_received(data)
+    assert len(fragmented) == 3
+    assert fragmented == messages
+    assert messages[2].value == 'été'
+    assert conn.buffer == b''
+
+
+def test_received_partial_frame(conn):
+    messages = []
+    conn.handle_message = messages.append
+    conn.data_received(b'Event: PeerStatus\nPeer: gawel\n')
+    assert messages == []
+    conn.data_received(b'\nEvent: Peer')
+    assert [m.peer for m in messages] == ['gawel']
+    assert conn.buffer == b'Event: Peer'
+
+
+def test_prefilter(conn):
+    messages = []
+    conn.handle_message = messages.append
+    conn.data_received(b'Event: VarSet\nValue: x\n\n')
+    assert messages == []
+    assert conn.factory.skipped_frames == 1
+    conn.data_received(b'Event: PeerStatus\nPeer: gawel\n\n')
+    conn.data_received(b'Event: Shutdown\n\n')
+    assert [m.event for m in messages] == ['PeerStatus', 'Shutdown']
+    conn.factory.register_event('VarSet', lambda *args: None)
+    conn.data_received(b'Event: VarSet\nValue: x\n\n')
+    assert messages[-1].event == 'VarSet'
+    assert conn.factory.skipped_frames == 1
+
+
+def test_prefilter_pending_action(conn):
+    messages = []
+    conn.handle_message = messages.append
+    action = conn.send({'Action': 'Status'})
+    conn.data_received(
+        b'Event: Status\nActionID: ' + action.id.encode() + b'\n\n')
+    conn.data_received(
+        b'Event: Status\nActionId: ' + action.id.encode() + b'\n\n')
+    assert [m.event for m in messages] == ['Status', 'Status']
+    assert conn.factory.skipped_frames == 0
+
+
+@pytest.mark.asyncio
+async def test_action_async_iterator():
+    loop = asyncio.get_running_loop()
+    action = actions.Action({'Action': 'QueueStatus'}, as_list=True)
+    messages = [
+        Message({'Response': 'Success', 'EventList': 'start'}),
+        Message({'Event': 'QueueMember'}),
+        Message({'Event': 'QueueStatusComplete'}),
+    ]
+    for i, msg in enumerate(messages):
+        loop.call_later(i * .01, action.add_message, msg)
+    start = loop.time()
+    responses = [resp async for resp in action]
+    assert responses == messages
+    assert loop.time() - start < .1
+    assert action.result() == messages
+
+
+@pytest.mark.asyncio
+async def test_action_async_iterator_cancelled():
+    loop = asyncio.get_running_loop()
+    action = actions.Action({'Action': 'QueueStatus'}, as_list=True)
+    loop.call_later(.01, action.cancel)
+    assert [resp async for resp in action] == []
+
+
+@pytest.mark.asyncio
+async def test_action_timeout():
+    manager = testing.Manager(loop=asyncio.get_running_loop(),
+                              action_timeout=10)
+    conn = manager.protocol
+    action = manager.send_action(
+        actions.Action({'Action': 'SIPpeers', 'ActionID': '1'},
+                       response_timeout=.01))
+    conn.data_received(b'Response: Success\nActionID: ' +
+                       action.id.encode() +
+                       b'\nEventList: start\nMessage: will follow\n\n')
+    done = manager.send_action({'Action': 'Status', 'ActionID': '2'})
+    conn.data_received(
+        b'Response: Success\nActionID: ' + done.id.encode() + b'\n\n')
+    assert len(conn.timers) == 1
+    assert manager.outstanding_actions == 1
+    with pytest.raises(ActionTimeoutError) as exc:
+        await action
+    assert len(exc.value.action.responses) == 1
+    assert manager.timed_out_actions == 1
+    assert manager.outstanding_actions == 0
+    assert conn.responses == {}
+    assert len(conn.timers) == 0
+
+
+def test_action_completion(conn):
+    action = actions.Action({'Action': 'SIPpeers', 'ActionID': '1'})
+    action.add_message(LazyMessage.from_line(
+        'Response: Success\nActionID: 1\nEventList: start\n'
+        'Message: Peer status list will follow'))
+    assert action.multi
+    action.as_list = False  # the decision is cached
+    assert action.multi
+    peers = [LazyMessage.from_line('Event: PeerEntry\nActionID: 1\n'
+                                   'ObjectName: %d' % i) for i in range(3)]
+    for peer in peers:
+        assert not action.add_message(peer)
+    assert not any(peer.parsed for peer in peers)
+    assert action.add_message(LazyMessage.from_line(
+        'Event: PeerlistComplete\nActionID: 1\nEventList: Complete'))
+    assert len(action.result()) == 5
+
+
+def test_action_terminal_events(conn):
+    actions.Action.terminal_events_by_action['myaction'] = frozenset(
+        ['MyActionDone'])
+    try:
+        action = actions.Action({'Action': 'MyAction'}, as_list=True)
+        action.add_message(Message({'Response': 'Success'}))
+        assert not action.add_message(Message({'Event': 'MyActionItem'}))
+        assert action.add_message(Message({'Event': 'MyActionDone'}))
+    finally:
+        del actions.Action.terminal_events_by_action['myaction']
+
+
+def peers_list(count):
+    yield Message({'Response': 'Success', 'ActionID': '1',
+                   'EventList': 'start'})
+    for i in range(count):
+        yield Message({'Event': 'PeerEntry', 'ActionID': '1',
+                       'ObjectName': str(i)})
+    yield Message({'Event': 'PeerlistComplete', 'ActionID': '1'})
+
+
+def test_action_sink(conn):
+    events = []
+    action = actions.Action({'Action': 'SIPpeers', 'ActionID': '1'},
+                            sink=events.append)
+    for message in peers_list(100):
+        action.add_message(message)
+    assert len(events) == 102
+    assert [r.eventlist or r.event for r in action.result()] == [
+        'start', 'PeerlistComplete']
+    assert action.received == 102
+
+
+@pytest.mark.asyncio
+async def test_action_window():
+    loop = asyncio.get_running_loop()
+    transport = mock.Mock()
+    transport.is_closing.return_value = False
+    action = actions.Action({'Action': 'SIPpeers', 'ActionID': '1'},
+                            window=10)
+    action.transport = transport
+    messages = list(peers_list(20))
+    for message in messages[:12]:
+        action.add_message(message)
+    # nobody iterates yet
+    assert not transport.pause_reading.called
+    assert len(action.responses) == 2
+
+    received = []
+    iterator = action.__aiter__()
+    assert transport.pause_reading.called
+    async for message in iterator:
+        received.append(message)
+        if len(received) == 10:
+            assert transport.resume_reading.called
+            for message in messages[12:]:
+                loop.call_soon(action.add_message, message)
+    assert received == messages
+    assert len(action.result()) == 2
+
+
+@pytest.mark.asyncio
+async def test_action_window_await():
+    loop = asyncio.get_running_loop()
+    transport = mock.Mock()
+    transport.is_closing.return_value = False
+    action = actions.Action({'Action': 'SIPpeers', 'ActionID': '1'},
+                            window=2)
+    action.transport = transport
+    for message in peers_list(3):
+        loop.call_soon(action.add_message, message)
+    result = await asyncio.wait_for(action, 1)
+    assert [r.eventlist or r.event for r in result] == [
+        'start', 'PeerlistComplete']
+    assert not transport.pause_reading.called
+
+    # break out of the loop then await the action
+    action = actions.Action({'Action': 'SIPpeers', 'ActionID': '2'},
+                            window=2)
+    action.transport = transport
+    messages = list(peers_list(3))
+    for message in messages[:3]:
+        action.add_message(message)
+    async for message in action:
+        break
+    assert transport.pause_reading.called
+    for message in messages[3:]:
+        loop.call_soon(action.add_message, message)
+    assert len(await action) == 2
+    assert transport.resume_reading.called
+    assert not action.pending
+
+
+def test_send_nowait(conn):
+    manager = conn.factory
+    assert manager.send_action({'Action': 'UserEvent', 'UserEvent': 'Foo'},
+                               wait=False) is None
+    assert conn.responses == {}
+    assert conn.outstanding == 0
+    payload = conn.transport.write.call_args[0][0]
+    assert payload == b'Action: UserEvent\nUserEvent: Foo\n\n'
+    # the response without ActionID is ignored
+    conn.data_received(b'Response: Success\n\n')
+
+
+def test_send_actions(conn):
+    template = actions.ActionTemplate({'Action': 'DBGet', 'Family': 'cid'})
+    sent = conn.factory.send_actions(
+        [template.action(Key=str(i), ActionID=str(i)) for i in range(3)] +
+        [{'Action': 'Ping', 'ActionID': '3'}])
+    assert [a.id for a in sent] == ['0', '1', '2', '3']
+    assert conn.outstanding == 4
+    payloads = conn.transport.writelines.call_args[0][0]
+    assert payloads[0] == (
+        b'Action: DBGet\nFamily: cid\nKey: 0\nActionID: 0\n\n')
+    assert payloads[0] == actions.serialize(sent[0])
+    assert payloads[3] == b'Action: Ping\nActionID: 3\n\n'
+    sent[1]['Key'] = 'x'
+    assert sent[1].serialize() == (
+        b'Action: DBGet\nFamily: cid\nKey: x\nActionID: 1\n\n')
+
+
+def test_template_override():
+    template = actions.ActionTemplate(
+        {'Action': 'Originate', 'Channel': 'SIP/default', 'Exten': '1'})
+    action = template.action(channel='SIP/x', ActionID='1')
+    assert action['channel'] == 'SIP/x'
+    assert action.serialize() == (
+        b'Action: Originate\nExten: 1\nchannel: SIP/x\nActionID: 1\n\n')
+    assert template.render(Channel='SIP/y') == (
+        b'Action: Originate\nExten: 1\nChannel: SIP/y\n\n')
+    assert template.render() == (
+        b'Action: Originate\nChannel: SIP/default\nExten: 1\n\n')
+
+    template = actions.ActionTemplate({'Command': 'core show uptime'},
+                                      action_class=actions.Command)
+    command = template.action(ActionID='2')
+    assert command.serialize() == (
+        b'Command: core show uptime\nActionID: 2\nAction: Command\n'
+        b'CommandID: ' + command.id.encode() + b'\n\n')
+
+
+@pytest.mark.asyncio
+async def test_coalesce_writes():
+    manager = testing.Manager(loop=asyncio.get_running_loop(),
+                              coalesce_writes=True, coalesce_max_bytes=100)
+    conn = manager.protocol
+    conn.transport = mock.Mock()
+    for i in range(3):
+        manager.send_action({'Action': 'Ping', 'ActionID': str(i)})
+    assert not conn.transport.method_calls
+    await asyncio.sleep(0)
+    conn.transport.writelines.assert_called_once_with([
+        b'Action: Ping\nActionID: %d\n\n' % i for i in range(3)])
+    assert conn.write_buffer == []
+
+    # flushed as soon as the buffer is big enough
+    manager.send_action({'Action': 'UserEvent', 'UserEvent': 'x' * 100},
+                        wait=False)
+    conn.transport.write.assert_called_once()
+    assert conn.flush_handle is None
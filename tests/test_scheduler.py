@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from unittest import mock
+from panoramisk import actions
+from panoramisk.scheduler import OutboundScheduler
+
+
+def sent(protocol):
+    actions = []
+    for name, args, kwargs in protocol.method_calls:
+        actions.extend(args[0] if name == 'writelines' else args)
+    return [action.split(b'\n')[0].split()[1].decode()
+            if isinstance(action, bytes) else action['action']
+            for action in actions]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit():
+    loop = asyncio.get_running_loop()
+    protocol = mock.Mock()
+    scheduler = OutboundScheduler(protocol, loop, rate=100, burst=2)
+    for i in range(4):
+        scheduler.submit(actions.Action({'Action': 'Originate'}))
+    scheduler.submit(actions.Action({'Action': 'Hangup'}))
+    assert sent(protocol) == ['Originate', 'Originate', 'Hangup']
+    assert len(scheduler) == 2
+    await asyncio.sleep(.05)
+    assert len(scheduler) == 0
+    assert len(sent(protocol)) == 5
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_max_in_flight():
+    loop = asyncio.get_running_loop()
+    protocol = mock.Mock()
+    scheduler = OutboundScheduler(protocol, loop, max_in_flight=2)
+    bulk = [actions.Action({'Action': 'DBGet'}) for i in range(4)]
+    for action in bulk:
+        scheduler.submit(action)
+    assert len(sent(protocol)) == 2
+    bulk[0].set_result(None)
+    await asyncio.sleep(0)
+    assert len(sent(protocol)) == 3
+    assert scheduler.in_flight == 2
+
+    scheduler.pause_writing()
+    bulk[1].set_result(None)
+    scheduler.submit(actions.Action({'Action': 'Redirect'}))
+    await asyncio.sleep(0)
+    assert len(sent(protocol)) == 3
+    scheduler.resume_writing()
+    assert sent(protocol)[3:] == ['Redirect', 'DBGet']
+
+    # serialized actions are not counted as in flight
+    scheduler.submit(b'Action: Setvar\n\n', name='Setvar')
+    assert sent(protocol)[-1] == 'Setvar'
+    assert scheduler.in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_manager():
+    from panoramisk import Manager
+    from panoramisk import testing
+    server = testing.FakeAMIServer(handlers={
+        'DBGet': lambda server, action: [{
+            'Response': 'Success', 'ActionID': action['ActionID'],
+            'Val': action['Key']}],
+    })
+    await server.start()
+    manager = Manager(loop=asyncio.get_running_loop(), port=server.port,
+                      username='username', secret='secret', ping_delay=60,
+                      rate_limit=1000, max_in_flight=1)
+    await manager.connect()
+    assert isinstance(manager.protocol.scheduler, OutboundScheduler)
+    sent = [manager.send_action({'Action': 'DBGet', 'Key': str(i)})
+            for i in range(5)]
+    assert len(manager.protocol.scheduler) == 4
+    assert [(await a).val for a in sent] == ['0', '1', '2', '3', '4']
+    manager.close()
+    await server.close()
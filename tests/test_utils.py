@@ -1,4 +1,5 @@
 import asyncio
+import pytest
 from panoramisk import utils
 from panoramisk.exceptions import AGIException
 
@@ -107,3 +108,39 @@ def try_parse_agi_result(result):
         res['msg'] = err.args[0]
 
     return res
+
+
+def test_case_insensitive_dict():
+    cid = utils.CaseInsensitiveDict({'Channel': 'SIP/gawel', 'X-Custom': '1'})
+    with pytest.raises(AttributeError):
+        cid.attribute = 'no __dict__'
+    assert cid['CHANNEL'] == cid.channel == 'SIP/gawel'
+    assert 'x-custom' in cid
+    assert list(cid) == ['Channel', 'X-Custom']
+    # the case of the last key set is kept
+    cid['channel'] = 'SIP/lisa'
+    cid['x-CUSTOM'] = '2'
+    assert dict(cid) == {'channel': 'SIP/lisa', 'x-CUSTOM': '2'}
+    cid['Channel'] = 'SIP/gawel'
+    assert list(cid) == ['Channel', 'x-CUSTOM']
+    assert len(cid) == 2
+    cid = utils.CaseInsensitiveDict({'actionid': 'x', 'ActionID': 'y'})
+    assert list(cid) == ['ActionID']
+    assert cid['actionid'] == 'y'
+
+
+def test_id_generator():
+    generator = utils.IdGenerator('test')
+    assert generator in utils.IdGenerator.instances
+    utils.IdGenerator.reset(uid='uid')
+    generator.counter = iter([1, 10000, 10001, 10002])
+    assert [generator() for i in range(4)] == [
+        'test/uid/1/1', 'test/uid/1/10000', 'test/uid/2/1', 'test/uid/2/2']
+
+    compact = utils.IdGenerator('c', compact=True)
+    assert len(compact.uid) == 8
+    compact.counter = iter([1, 16, 255])
+    assert [compact().rsplit('/', 1)[1] for i in range(3)] == [
+        '1', '10', 'ff']
+    utils.IdGenerator.reset()
+    assert compact() == 'c/%s/1' % compact.uid